@@ -0,0 +1,58 @@
+"""Authentication backend that caches users between requests.
+
+Django loads the logged in user from the database on every request. This
+backend keeps it in the RECIPES_USER_CACHE alias (a per-process LocMem
+cache by default) instead. Saving or deleting a user drops the cached copy,
+which covers password changes and deactivation; the short cache timeout
+bounds how long other processes can keep serving an old copy.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+
+def get_user_cache():
+    return caches[getattr(settings, 'RECIPES_USER_CACHE', 'default')]
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_user(user_id):
+    """Drop a user from the cache, so the next request loads it from the database."""
+    get_user_cache().delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() is served from the user cache."""
+
+    def get_user(self, user_id):
+        cache = get_user_cache()
+        user = cache.get(user_cache_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(user_cache_key(user_id), user)
+        return user
+
+    async def aget_user(self, user_id):
+        cache = get_user_cache()
+        user = await cache.aget(user_cache_key(user_id))
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(user_cache_key(user_id), user)
+        return user
+
+
+def user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+# Connected here rather than in an app's ready(): nothing is cached until
+# this backend has been loaded
+post_save.connect(user_changed, sender=get_user_model(), dispatch_uid='recipes_cached_user_saved')
+post_delete.connect(user_changed, sender=get_user_model(), dispatch_uid='recipes_cached_user_deleted')
@@ -0,0 +1,179 @@
+"""Serving files from STATIC_ROOT and MEDIA_ROOT without DEBUG.
+
+file_response() answers conditional requests (ETag/Last-Modified), single
+byte ranges and, for static files, Accept-Encoding with the precompressed
+copies written by collectstatic. With RECIPES_SENDFILE set it only checks
+the file and hands the transfer to the front-end server: nginx's
+X-Accel-Redirect or Apache/lighttpd's X-Sendfile. That is the fastest way
+under ASGI as well, where Django can't use sendfile(2) and the file is read
+in chunks on a worker thread instead.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileRange:
+    """Read-only view of `length` bytes of an open file, starting at `start`."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+async def aread_chunks(file, chunk_size=FileResponse.block_size):
+    # Django reads a synchronous iterator into memory before sending it over
+    # ASGI, so read the file from a thread a chunk at a time instead
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while chunk := await read(chunk_size):
+            yield chunk
+    finally:
+        file.close()
+
+
+def parse_range(header, size):
+    """Return the (start, end) of a single-range Range header, inclusive.
+
+    None means the header should be ignored and the whole file sent;
+    multiple ranges aren't supported. Raises ValueError when the range
+    lies outside the file.
+    """
+    match = RANGE.match(header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-500: the last 500 bytes
+        if int(last) == 0:
+            raise ValueError("empty suffix range")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def accepted_encodings(request):
+    """Content codings the client accepts, i.e. listed without q=0."""
+    accepted = set()
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def file_response(request, document_root, path, max_age, immutable=False, precompressed=False):
+    """Serve `path` below `document_root` with caching, range and sendfile support."""
+    try:
+        fullpath = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+    if not os.path.isfile(fullpath):
+        raise Http404("Not found")
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    headers = {
+        "Cache-Control": f"public, max-age={max_age}" + (", immutable" if immutable else ""),
+        "Accept-Ranges": "bytes",
+    }
+    serve_path = fullpath
+    sendfile = getattr(settings, "RECIPES_SENDFILE", None)
+    # Compressed copies are only used for whole-file responses, so byte
+    # ranges always refer to the original file. The front-end server picks
+    # them itself when it sends the file (gzip_static).
+    if precompressed and not sendfile and not encoding and "Range" not in request.headers:
+        accepted = accepted_encodings(request)
+        for name, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if name in accepted and os.path.isfile(fullpath + suffix):
+                serve_path, encoding = fullpath + suffix, name
+                break
+
+    stat = os.stat(serve_path)
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    headers["ETag"] = etag
+    headers["Last-Modified"] = http_date(stat.st_mtime)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = send(request, serve_path, stat.st_size, content_type, etag, headers, sendfile)
+    for header, value in headers.items():
+        response.headers.setdefault(header, value)
+    if precompressed:
+        patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def send(request, path, size, content_type, etag, headers, sendfile):
+    content_type = content_type or "application/octet-stream"
+    if sendfile:
+        # The front-end server sends the file, honouring Range itself
+        response = HttpResponse(content_type=content_type)
+        if sendfile == "x-accel-redirect":
+            # An internal nginx location mapped onto the same directories,
+            # e.g. /_protected/media/ -> MEDIA_ROOT
+            response["X-Accel-Redirect"] = settings.RECIPES_SENDFILE_PREFIX + quote(request.path.lstrip("/"))
+        else:
+            response["X-Sendfile"] = path
+        return response
+
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    if "Range" in request.headers and (if_range is None or if_range in (etag, headers["Last-Modified"])):
+        try:
+            byte_range = parse_range(request.headers["Range"], size)
+        except ValueError:
+            response = HttpResponse(status=416, content_type=content_type)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    file = open(path, "rb")
+    status, length = 200, size
+    if byte_range is not None:
+        start, end = byte_range
+        status, length = 206, end - start + 1
+        file = FileRange(file, start, length)
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(aread_chunks(file), status=status, content_type=content_type)
+    else:
+        # A real file for whole-file responses, so WSGI servers can use sendfile(2)
+        response = FileResponse(file, status=status, content_type=content_type)
+    response["Content-Length"] = length
+    if byte_range is not None:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
@@ -0,0 +1,151 @@
+"""Per-request query, DB, chart and total timings.
+
+RequestMetricsMiddleware adds a Server-Timing header to every response and
+keeps per-view histograms, served in Prometheus text format by the
+staff-only metrics view. The histograms are per process, so each server
+worker reports its own.
+"""
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from recipes.timing import RequestTimings, current_timings
+
+
+def time_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.add('db', time.perf_counter() - start)
+
+
+def install_query_timer(connection, **kwargs):
+    # The wrapper list outlives reconnects, so only add it once
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(install_query_timer)
+
+
+# Upper bounds of the histogram buckets; +Inf is implied
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+METRICS = {
+    'recipes_request_duration_seconds': ('Total time spent handling the request', SECONDS_BUCKETS),
+    'recipes_request_db_seconds': ('Time spent in SQL queries', SECONDS_BUCKETS),
+    'recipes_request_chart_seconds': ('Time spent rendering charts', SECONDS_BUCKETS),
+    'recipes_request_queries': ('Number of SQL queries', QUERY_BUCKETS),
+}
+
+
+class Histograms:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (metric, view) -> [cumulative bucket counts..., +Inf count, sum]
+        self.series = {}
+
+    def observe(self, metric, view, value):
+        buckets = METRICS[metric][1]
+        with self.lock:
+            series = self.series.setdefault((metric, view), [0] * (len(buckets) + 2))
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+    def render(self):
+        """Return the histograms in the Prometheus text exposition format."""
+        with self.lock:
+            series = {key: list(values) for key, values in self.series.items()}
+        lines = []
+        for metric, (help_text, buckets) in METRICS.items():
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} histogram')
+            for (name, view), values in sorted(series.items()):
+                if name != metric:
+                    continue
+                label = view.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                for bound, count in zip(buckets, values):
+                    lines.append(f'{metric}_bucket{{view="{label}",le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{view="{label}",le="+Inf"}} {values[-2]}')
+                lines.append(f'{metric}_sum{{view="{label}"}} {values[-1]}')
+                lines.append(f'{metric}_count{{view="{label}"}} {values[-2]}')
+        return '\n'.join(lines) + '\n'
+
+
+histograms = Histograms()
+
+
+class RequestMetricsMiddleware:
+    """Time each request and report it in Server-Timing and the metrics histograms.
+
+    Works under WSGI and ASGI; put it first in MIDDLEWARE so the total
+    includes the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported missed the signal
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        total = time.perf_counter() - timings.start
+        db = timings.spans.get('db', 0.0)
+        chart = timings.spans.get('chart', 0.0)
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        histograms.observe('recipes_request_duration_seconds', view, total)
+        histograms.observe('recipes_request_db_seconds', view, db)
+        histograms.observe('recipes_request_chart_seconds', view, chart)
+        histograms.observe('recipes_request_queries', view, timings.queries)
+
+        if getattr(settings, 'RECIPES_SERVER_TIMING', True):
+            entries = [f'db;dur={db * 1000:.1f};desc="{timings.queries} queries"']
+            if chart:
+                entries.append(f'chart;dur={chart * 1000:.1f}')
+            entries.append(f'total;dur={total * 1000:.1f}')
+            response['Server-Timing'] = ', '.join(entries)
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'. 
@@ -41,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    "recipe_project.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -73,13 +76,172 @@ WSGI_APPLICATION = "recipe_project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# SQLite by default. Set RECIPES_DB_ENGINE=postgresql and the POSTGRES_*
+# variables to run on PostgreSQL instead.
+
+# Seconds to keep a connection open between requests (CONN_MAX_AGE). 0, a
+# connection per request, unless the WSGI entry point (recipe_project.wsgi)
+# sets 600: under ASGI each request may run its queries on a different
+# thread, and persistent connections there are neither reused nor closed,
+# so they pile up. Under ASGI, keep 0 or use the PostgreSQL pool instead.
+RECIPES_CONN_MAX_AGE = int(os.environ.get("RECIPES_CONN_MAX_AGE", "0"))
+
+if os.environ.get("RECIPES_DB_ENGINE") == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "recipes"),
+            "USER": os.environ.get("POSTGRES_USER", "recipes"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        }
+    }
+    if os.environ.get("RECIPES_DB_POOL", "1") == "1":
+        # psycopg connection pool (needs psycopg[pool]); pooled connections
+        # are reused instead of persistent ones, so CONN_MAX_AGE stays 0
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": int(os.environ.get("RECIPES_DB_POOL_MIN", "2")),
+                "max_size": int(os.environ.get("RECIPES_DB_POOL_MAX", "10")),
+            },
+        }
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = RECIPES_CONN_MAX_AGE
+        DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            # Health checks replace persistent connections that broke while idle
+            "CONN_MAX_AGE": RECIPES_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                # Take the write lock when a transaction starts, so writers
+                # queue on busy_timeout instead of failing on lock upgrade
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
+    }
+
+# Applied in order to every new SQLite connection (see recipes.signals).
+# WAL lets readers continue while a write is in progress; busy_timeout
+# comes first so it already applies to the others.
+RECIPES_SQLITE_PRAGMAS = {
+    "busy_timeout": 5000,
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 128 * 1024 * 1024,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LocMemCache is per process. With more than one server process, set
+# RECIPES_REDIS_URL (needs the redis package) so they share cached pages,
+# charts and sessions, and the data version that invalidates them (see
+# recipes.cache). Without it a process never sees invalidations made by the
+# others, so anything they could serve stale expires within a minute.
+RECIPES_REDIS_URL = os.environ.get("RECIPES_REDIS_URL")
+
+
+def shared_cache(location, timeout=300, max_entries=None):
+    if RECIPES_REDIS_URL:
+        return {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": RECIPES_REDIS_URL,
+            "KEY_PREFIX": location,
+            "TIMEOUT": timeout,
+        }
+    cache = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": location,
+        "TIMEOUT": timeout,
     }
+    if max_entries:
+        # LocMemCache evicts least recently used entries beyond this
+        cache["OPTIONS"] = {"MAX_ENTRIES": max_entries}
+    return cache
+
+
+# How long (seconds) caches that other processes can't invalidate may be stale
+LOCAL_CACHE_TIMEOUT = None if RECIPES_REDIS_URL else 60
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    "charts": shared_cache("charts", timeout=600, max_entries=256),
+    "pages": shared_cache("pages", timeout=LOCAL_CACHE_TIMEOUT or 300, max_entries=1000),
+    # Sessions must be visible to every server process; set RECIPES_REDIS_URL
+    # when running more than one
+    "sessions": shared_cache("sessions", max_entries=5000),
+    # Rendered recipe cards ({% cache %} looks this alias up by name); keyed
+    # on each recipe's updated_at, so edits never serve a stale card, and on
+    # the pages generation that bulk invalidation bumps (see recipes.cache)
+    "template_fragments": shared_cache("template_fragments", timeout=3600, max_entries=5000),
+    # Per-process copies of logged in users; kept short so a password change
+    # made through another process is picked up quickly
+    "users": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "users",
+        "TIMEOUT": 60,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
 }
 
+# The recipe data version is kept until the next change with a shared cache,
+# and re-seeded every minute otherwise (see LOCAL_CACHE_TIMEOUT)
+RECIPES_DATA_VERSION_TIMEOUT = LOCAL_CACHE_TIMEOUT
+
+# Sessions are read from the cache and written through to the database.
+# RECIPES_SESSION_ENGINE=django.contrib.sessions.backends.signed_cookies
+# keeps them in the browser cookie instead, with no server-side lookup.
+SESSION_ENGINE = os.environ.get("RECIPES_SESSION_ENGINE", "django.contrib.sessions.backends.cached_db")
+SESSION_CACHE_ALIAS = "sessions"
+
+# Serves the logged in user from RECIPES_USER_CACHE instead of a query per request
+AUTHENTICATION_BACKENDS = ["recipe_project.backends.CachedModelBackend"]
+RECIPES_USER_CACHE = "users"
+
+# Cache alias and TTL (seconds) used for rendered analytics charts
+RECIPES_CHART_CACHE = "charts"
+RECIPES_CHART_CACHE_TIMEOUT = 600
+
+# Add a Server-Timing header (db, chart and total time) to every response
+RECIPES_SERVER_TIMING = True
+
+# Cache alias for rendered recipe detail pages and the unfiltered list
+RECIPES_PAGE_CACHE = "pages"
+
+# How many similar recipes each detail page lists
+RECIPES_SIMILAR_COUNT = 6
+
+# Recipes per page on the list view; "keyset" pagination uses cursors instead of
+# page numbers so deep pages cost the same as the first one
+RECIPES_PAGE_SIZE = 12
+RECIPES_PAGINATION = "pages"
+
+# "svg" draws the page's charts as SVG in pure Python, in the request;
+# "matplotlib" links PNGs drawn by matplotlib in the worker pool below.
+# PNG URLs always use matplotlib, whichever backend is selected.
+RECIPES_CHART_BACKEND = "svg"
+
+# Matplotlib chart rendering runs in this many worker processes (0 renders in the request
+# thread). Renders are refused once the queue is full and abandoned after the
+# timeout (seconds), and the page shows "chart unavailable" instead.
+RECIPES_CHART_WORKERS = 2
+RECIPES_CHART_QUEUE_SIZE = 8
+RECIPES_CHART_TIMEOUT = 5
+
+# Browser cache lifetime (seconds) for chart images before revalidating by ETag
+RECIPES_CHART_MAX_AGE = 300
+
+# Browser cache lifetime (seconds) for search form suggestions before revalidating by ETag
+RECIPES_AUTOCOMPLETE_MAX_AGE = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -116,10 +278,34 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = "static/"
+# collectstatic writes hashed, precompressed copies here
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "recipe_project.storage.CompressedManifestStaticFilesStorage"},
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT= BASE_DIR / 'media'
 
+# Serve STATIC_ROOT and MEDIA_ROOT from Django (with ETag, Range and
+# precompressed static files) when no front-end server does it
+RECIPES_SERVE_FILES = True
+# Hand the file transfer to the front-end server after the checks:
+# "x-accel-redirect" (nginx, internal location RECIPES_SENDFILE_PREFIX
+# mapped onto the project directory) or "x-sendfile" (Apache, lighttpd)
+RECIPES_SENDFILE = os.environ.get("RECIPES_SENDFILE") or None
+RECIPES_SENDFILE_PREFIX = "/_protected/"
+# Hashed static names never change content; media names can be reused
+RECIPES_STATIC_MAX_AGE = 60 * 60 * 24 * 365
+RECIPES_MEDIA_MAX_AGE = 60 * 60 * 24
+
+# Resized copies of recipe pictures, written to a thumbs/ folder next to the original
+RECIPES_THUMBNAIL_WIDTHS = [320, 640]
+RECIPES_THUMBNAIL_FORMAT = "WEBP"
+RECIPES_THUMBNAIL_QUALITY = 80
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
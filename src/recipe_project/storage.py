@@ -0,0 +1,65 @@
+"""Static files storage that hashes file names and precompresses them.
+
+collectstatic copies every file to STATIC_ROOT under a content-hashed name
+(admin/css/base.3f2a9c1d8e4b.css), so it can be cached forever, and writes
+a .gz copy, plus a .br copy when the brotli package is installed, next to
+each text asset. The front-end server (nginx gzip_static/brotli_static) or
+static_view in recipe_project.views sends those to clients that accept them.
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Images and fonts are already compressed; zipping them only costs CPU
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".mjs", ".map", ".svg", ".html", ".txt", ".json", ".xml", ".ico")
+# Below this the compressed copy isn't worth an extra file
+MIN_COMPRESS_SIZE = 512
+
+
+def compressors():
+    yield ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield ".br", lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        # Without a manifest (collectstatic hasn't run, e.g. in tests or a
+        # fresh checkout) fall back to the unhashed name instead of raising
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        written = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                written.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in sorted(written):
+                self.compress(name)
+
+    def compress(self, name):
+        """Write the compressed copies of one file, if it's worth compressing."""
+        if not name or not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, compress in compressors():
+            compressed = compress(data)
+            # Keep it only if it saves at least 5%
+            if len(compressed) >= len(data) * 0.95:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
@@ -15,12 +15,13 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include 
+import re
+
+from django.urls import path, include, re_path
 
 from django.conf import settings
-from django.conf.urls.static import static
 
-from .views import login_view, logout_view, logout_success  
+from .views import login_view, logout_view, logout_success, metrics_view, media_view, static_view
 
  
 urlpatterns = [
@@ -29,6 +30,13 @@ urlpatterns = [
     path("login/", login_view, name="login"),
     path("logout/", logout_view, name="logout"),
     path("logout/success/", logout_success, name="logout_success"),  # Add this line
+    path("metrics/", metrics_view, name="metrics"),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Media and collected static files, also with DEBUG = False (runserver still
+# serves static files from the apps in DEBUG)
+if settings.RECIPES_SERVE_FILES:
+    urlpatterns += [
+        re_path(rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.+)$", media_view, name="media"),
+        re_path(rf"^{re.escape(settings.STATIC_URL.lstrip('/'))}(?P<path>.+)$", static_view, name="static"),
+    ]
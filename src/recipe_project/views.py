@@ -1,11 +1,27 @@
 from django.shortcuts import render, redirect  
 #Django authentication libraries           
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import aauthenticate, alogin, alogout
 #Django Form for authentication
 from django.contrib.auth.forms import AuthenticationForm    
+#run the form's sync validation from the async views
+from asgiref.sync import sync_to_async
+#metrics endpoint is for staff only
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
+#request histograms collected by the metrics middleware
+from .middleware import histograms
+#per-process cache of logged in users
+from .backends import forget_user
+#file serving with ETag, Range and sendfile support
+import os
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from .files import file_response
 
 #define a function view called login_view that takes a request from user
-def login_view(request):
+async def login_view(request):
    #initialize:
    #error_message to None                                 
    error_message = None   
@@ -19,15 +35,15 @@ def login_view(request):
        form =AuthenticationForm(data=request.POST)
 
        #check if form is valid
-       if form.is_valid():                                
+       if await sync_to_async(form.is_valid)():           
            username=form.cleaned_data.get('username')      #read username
            password = form.cleaned_data.get('password')    #read password
 
            #use Django authenticate function to validate the user
-           user=authenticate(username=username, password=password)
+           user=await aauthenticate(request, username=username, password=password)
            if user is not None:                    #if user is authenticated
           #then use pre-defined Django function to login
-               login(request, user)                
+               await alogin(request, user)         
                return redirect('recipes:recipes_list') #& send the user to desired page
        else:                                               #in case of error
            error_message ='ooops.. something went wrong'   #print error message
@@ -41,9 +57,44 @@ def login_view(request):
    return render(request, 'auth/login.html', context) 
 
 #define a function view called logout_view that takes a request from user
-def logout_view(request):
-   logout(request)                        #use pre-defined Django function to logout
+async def logout_view(request):
+   user = await request.auser()
+   await sync_to_async(forget_user)(user.pk)  #drop the cached copy of the user
+   await alogout(request)                 #use pre-defined Django function to logout
    return redirect('logout_success') #& send the user to home page 
 
-def logout_success(request):
-   return render(request, 'auth/success.html')        
\ No newline at end of file
+async def logout_success(request):
+   return render(request, 'auth/success.html')
+
+#Prometheus text format histograms of per-view timings, for staff users
+@staff_member_required
+def metrics_view(request):
+   return HttpResponse(histograms.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+#user uploaded pictures and their thumbnails, revalidated after RECIPES_MEDIA_MAX_AGE
+def media_view(request, path):
+   return file_response(request, settings.MEDIA_ROOT, path, settings.RECIPES_MEDIA_MAX_AGE)
+
+#hashed names from the collectstatic manifest, as a set built once per manifest load
+_hashed_names = (None, frozenset())
+
+def hashed_names():
+   global _hashed_names
+   hashed_files = staticfiles_storage.hashed_files
+   if _hashed_names[0] is not hashed_files:
+       _hashed_names = (hashed_files, frozenset(hashed_files.values()))
+   return _hashed_names[1]
+
+#collectstatic output; hashed names are cached for good, other names revalidated hourly
+def static_view(request, path):
+   immutable = path in hashed_names()
+   max_age = settings.RECIPES_STATIC_MAX_AGE if immutable else 60 * 60
+   #without a manifest (collectstatic hasn't run, e.g. a fresh checkout) serve the apps' own copies
+   if not staticfiles_storage.hashed_files:
+       try:
+           found = finders.find(path)
+       except SuspiciousFileOperation:
+           raise Http404("Not found")
+       if found:
+           return file_response(request, os.path.dirname(found), os.path.basename(found), max_age)
+   return file_response(request, settings.STATIC_ROOT, path, max_age, immutable=immutable, precompressed=True)
@@ -12,5 +12,8 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "recipe_project.settings")
+# A WSGI worker thread handles one request at a time and can keep its
+# connection between them (see RECIPES_CONN_MAX_AGE in settings)
+os.environ.setdefault("RECIPES_CONN_MAX_AGE", "600")
 
 application = get_wsgi_application()
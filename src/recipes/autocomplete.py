@@ -0,0 +1,91 @@
+"""Prefix index for the search form's typeahead.
+
+Recipe names and ingredient names are kept in memory as sorted arrays, so
+a prefix is two bisections and a slice. Each process builds the index on
+first use and again when the recipe data version (see recipes.cache)
+moves on, or once it is older than a per-process version may be stale
+(RECIPES_DATA_VERSION_TIMEOUT); until the rebuild finishes, concurrent
+requests keep answering from the previous index.
+"""
+import bisect
+import threading
+import time
+
+from .cache import data_version_timeout
+from .models import Ingredient, Recipe, RecipeIngredient
+
+FIELDS = ('name', 'ingredients')
+
+
+def normalize(text):
+    return ' '.join((text or '').split()).lower()
+
+
+class PrefixIndex:
+    """Terms sorted by their normalized form, for prefix lookups with bisect."""
+
+    def __init__(self, terms):
+        # The first spelling of each normalized term is the one suggested
+        spellings = {}
+        for term in terms:
+            spellings.setdefault(normalize(term), ' '.join(term.split()))
+        spellings.pop('', None)
+        self.keys = sorted(spellings)
+        self.terms = [spellings[key] for key in self.keys]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def complete(self, prefix, limit=10):
+        """Up to `limit` terms starting with `prefix`, case-insensitively, in order."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.keys, prefix)
+        # Every key starting with the prefix sorts below prefix + the last code point
+        end = bisect.bisect_left(self.keys, prefix + '\U0010ffff', start)
+        return self.terms[start:min(end, start + limit)]
+
+
+def build_indexes():
+    names = Recipe.objects.values_list('name', flat=True).iterator(chunk_size=10000)
+    # Ingredient rows outlive the recipes that used them, so only suggest linked ones
+    ingredients = Ingredient.objects.filter(
+        id__in=RecipeIngredient.objects.values('ingredient_id')
+    ).values_list('name', flat=True)
+    return {'name': PrefixIndex(names), 'ingredients': PrefixIndex(ingredients)}
+
+
+_lock = threading.Lock()
+_state = {'version': None, 'indexes': None, 'built_at': None}
+
+
+def is_current(version):
+    # Without a shared cache, bumps made by other processes never reach this
+    # one, so the index also expires like the version does
+    max_age = data_version_timeout()
+    if _state['version'] != version:
+        return False
+    return max_age is None or time.monotonic() - _state['built_at'] < max_age
+
+
+def current_indexes(version):
+    # Without touching the database, so async views can call it directly
+    return _state['indexes'] if is_current(version) else None
+
+
+def get_indexes(version):
+    """The indexes for the given data version, building them if needed."""
+    if is_current(version):
+        return _state['indexes']
+    if not _lock.acquire(blocking=_state['indexes'] is None):
+        # Another thread is rebuilding; the previous index is close enough
+        return _state['indexes']
+    try:
+        if not is_current(version):
+            _state['indexes'] = build_indexes()
+            _state['version'] = version
+            _state['built_at'] = time.monotonic()
+        return _state['indexes']
+    finally:
+        _lock.release()
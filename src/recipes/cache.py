@@ -0,0 +1,224 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+
+from .models import split_ingredients
+
+# Cache key holding the recipe table version. It is bumped on every
+# Recipe save/delete so cached charts for older data are never served.
+DATA_VERSION_KEY = 'recipes:data_version'
+# Generation of the detail pages and recipe cards, bumped to drop them all.
+# clear() would do the same, but on a shared Redis database it flushes every
+# alias and the sessions with it
+PAGES_GENERATION_KEY = 'recipes:pages_generation'
+
+
+def get_chart_cache():
+    return caches[getattr(settings, 'RECIPES_CHART_CACHE', 'default')]
+
+
+def get_version(cache, key, timeout=DEFAULT_TIMEOUT):
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a counter that was evicted never restarts
+        # at a value that older cache entries were stored under
+        cache.add(key, time.time_ns(), timeout=timeout)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(cache, key, timeout=DEFAULT_TIMEOUT):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=timeout)
+        version = await cache.aget(key)
+    return version
+
+
+def get_data_version():
+    return get_version(get_chart_cache(), DATA_VERSION_KEY, data_version_timeout())
+
+
+async def aget_data_version():
+    return await aget_version(get_chart_cache(), DATA_VERSION_KEY, data_version_timeout())
+
+
+def get_pages_generation():
+    return get_version(get_page_cache(), PAGES_GENERATION_KEY, timeout=None)
+
+
+async def aget_pages_generation():
+    return await aget_version(get_page_cache(), PAGES_GENERATION_KEY, timeout=None)
+
+
+def detail_page_version(pk):
+    # A detail page is stored under the pages generation and its recipe's own
+    # version, which invalidation moves on instead of deleting the page. A
+    # request that read the old rows stores its page under the old version,
+    # however late it gets there, so it is never served
+    cache = get_page_cache()
+    return f'{get_pages_generation()}.{get_version(cache, detail_version_key(pk))}'
+
+
+async def adetail_page_version(pk):
+    cache = get_page_cache()
+    return f'{await aget_pages_generation()}.{await aget_version(cache, detail_version_key(pk))}'
+
+
+def data_version_timeout():
+    # None keeps the version until it is bumped. A per-process cache can't
+    # see bumps made by other processes, so there it expires instead (see
+    # RECIPES_DATA_VERSION_TIMEOUT in settings)
+    return getattr(settings, 'RECIPES_DATA_VERSION_TIMEOUT', None)
+
+
+def get_page_cache():
+    return caches[getattr(settings, 'RECIPES_PAGE_CACHE', 'default')]
+
+
+def detail_cache_key(pk):
+    return f'recipes:detail:{pk}'
+
+
+def detail_version_key(pk):
+    return f'recipes:detail_version:{pk}'
+
+
+def list_cache_key(query):
+    return 'recipes:list:' + hashlib.sha1(query.encode()).hexdigest()
+
+
+def invalidate_recipes(pks=None):
+    """Drop cached data after recipes change.
+
+    Cached charts and lists go with the data version. Detail pages are
+    dropped for the given recipe ids, or all of them when pks is None, for
+    bulk updates that don't know which rows they touched. Those also drop
+    the cached recipe cards, in case they changed rows without touching
+    updated_at, by moving both to a new pages generation.
+    """
+    bump_data_version()
+    if pks is None:
+        get_page_cache().set(PAGES_GENERATION_KEY, time.time_ns(), timeout=None)
+    else:
+        invalidate_detail_pages(pks)
+
+
+def invalidate_detail_pages(pks):
+    # Only the rendered detail pages, for changes that leave the data version
+    # alone; they move to a new version (see detail_page_version)
+    version = time.time_ns()
+    get_page_cache().set_many({detail_version_key(pk): version for pk in pks})
+
+
+def invalidate_on_commit(invalidate, *args):
+    """Run an invalidation now and again once the current transaction commits.
+
+    A request that caches the rows between the two, before the commit or
+    before the derived rows are written, stores them under the
+    intermediate version, which the second run replaces.
+    Outside a transaction both run at once.
+    """
+    invalidate(*args)
+    transaction.on_commit(lambda: invalidate(*args))
+
+
+def bump_data_version():
+    cache = get_chart_cache()
+    try:
+        return cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        # Key missing (first write or evicted), start a new version
+        version = time.time_ns()
+        cache.set(DATA_VERSION_KEY, version, timeout=data_version_timeout())
+        return version
+
+
+def normalize_filters(cleaned_data):
+    """Reduce search form data to a canonical dict so equivalent searches share a key."""
+    normalized = {}
+    for field, value in (cleaned_data or {}).items():
+        if value is None or value == '':
+            continue
+        if field == 'ingredients':
+            value = sorted(split_ingredients(value))
+            if not value:
+                continue
+        elif isinstance(value, str):
+            value = value.strip().lower()
+            if not value:
+                continue
+        normalized[field] = value
+    return normalized
+
+
+def filters_digest(filters):
+    payload = json.dumps(normalize_filters(filters), sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def chart_cache_key(filters, kind, fmt):
+    return f'recipes:charts:{kind}.{fmt}:' + filters_digest(filters)
+
+
+def stats_cache_key(filters):
+    return 'recipes:stats:' + filters_digest(filters)
+
+
+def chart_etag(filters, kind, fmt, version=None):
+    # Derived from the key and data version, so it can be checked without rendering
+    if version is None:
+        version = get_data_version()
+    digest = hashlib.sha1(f'{chart_cache_key(filters, kind, fmt)}:{version}'.encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def get_or_compute(key, compute):
+    """Return the value cached for the current data version, calling compute() on a miss."""
+    cache = get_chart_cache()
+    version = get_data_version()
+    value = cache.get(key, version=version)
+    if value is None:
+        value = compute()
+        if value is not None:
+            cache.set(key, value, timeout=getattr(settings, 'RECIPES_CHART_CACHE_TIMEOUT', 600), version=version)
+    return value
+
+
+async def aget_or_compute(key, compute):
+    """Async get_or_compute(); compute is a coroutine function."""
+    cache = get_chart_cache()
+    version = await aget_data_version()
+    value = await cache.aget(key, version=version)
+    if value is None:
+        value = await compute()
+        if value is not None:
+            await cache.aset(key, value, timeout=getattr(settings, 'RECIPES_CHART_CACHE_TIMEOUT', 600), version=version)
+    return value
+
+
+def get_or_render_chart(filters, kind, fmt, render):
+    """Return the cached chart bytes for the filters, calling render() on a miss."""
+    return get_or_compute(chart_cache_key(filters, kind, fmt), render)
+
+
+def get_or_compute_stats(filters, compute):
+    """Return the cached chart statistics for the filters, calling compute() on a miss.
+
+    The list page computes them first, so the three chart requests it links
+    reuse one aggregate instead of each running their own.
+    """
+    return get_or_compute(stats_cache_key(filters), compute)
+
+
+async def aget_or_render_chart(filters, kind, fmt, render):
+    return await aget_or_compute(chart_cache_key(filters, kind, fmt), render)
+
+
+async def aget_or_compute_stats(filters, compute):
+    return await aget_or_compute(stats_cache_key(filters), compute)
@@ -0,0 +1,135 @@
+"""Run chart renders in a pool of worker processes.
+
+Workers import matplotlib and draw a warm-up chart when they start. Renders
+are refused rather than queued once RECIPES_CHART_QUEUE_SIZE are pending, and
+a render that takes longer than RECIPES_CHART_TIMEOUT seconds is abandoned, so
+a request never blocks for long on a busy or broken pool; callers get None and
+show a "chart unavailable" placeholder instead.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import svg_charts
+from .timing import timed
+
+logger = logging.getLogger(__name__)
+
+# recipes.charts imports matplotlib, so it is only loaded on the first
+# matplotlib render, and with the pool only in the workers
+CHART_KINDS = ('pie', 'bar', 'line')
+
+
+def chart_format():
+    """The format the pages link charts in: SVG with the SVG backend, else PNG."""
+    return 'svg' if settings.RECIPES_CHART_BACKEND == 'svg' else 'png'
+
+
+def svg_backend(fmt):
+    # The pure-Python SVG renderer takes milliseconds, less than a trip to the
+    # pool, so it runs in the request; PNGs always come from matplotlib
+    return fmt == 'svg' and settings.RECIPES_CHART_BACKEND == 'svg'
+
+
+def warm_up_worker():
+    from . import charts
+    charts.warm_up()
+
+
+def render_in_worker(kind, stats, fmt):
+    from . import charts
+    return charts.render(kind, stats, fmt)
+
+
+_pool = None
+_slots = None
+_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool, _slots
+    with _lock:
+        if _pool is None:
+            # Spawned rather than forked, forking a threaded server process is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.RECIPES_CHART_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=warm_up_worker,
+            )
+            _slots = threading.BoundedSemaphore(settings.RECIPES_CHART_QUEUE_SIZE)
+        return _pool, _slots
+
+
+def shutdown_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def submit(kind, stats, fmt):
+    # Queue a render, or return None if the queue is full or the pool is broken
+    pool, slots = get_pool()
+    if not slots.acquire(blocking=False):
+        return None
+    try:
+        future = pool.submit(render_in_worker, kind, stats, fmt)
+    except RuntimeError:
+        # The pool broke or was shut down; start a fresh one next time
+        slots.release()
+        shutdown_pool()
+        return None
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def render_chart(kind, stats, fmt='png'):
+    """Render a chart, returning its bytes or None if it could not be rendered in time."""
+    with timed('chart'):
+        if svg_backend(fmt):
+            return svg_charts.render(kind, stats, fmt)
+        if not settings.RECIPES_CHART_WORKERS:
+            from . import charts
+            return charts.render(kind, stats, fmt)
+        
+        future = submit(kind, stats, fmt)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=settings.RECIPES_CHART_TIMEOUT)
+        except (asyncio.TimeoutError, concurrent.futures.TimeoutError):
+            # Separate classes before Python 3.11, aliases of TimeoutError since
+            logger.warning('%s chart render timed out', kind)
+            return None
+        except Exception:
+            logger.exception('%s chart render failed', kind)
+            return None
+
+
+async def arender_chart(kind, stats, fmt='png'):
+    """Async render_chart() that waits on the worker without holding a thread."""
+    with timed('chart'):
+        if svg_backend(fmt):
+            return svg_charts.render(kind, stats, fmt)
+        if not settings.RECIPES_CHART_WORKERS:
+            from . import charts
+            return await sync_to_async(charts.render, thread_sensitive=False)(kind, stats, fmt)
+        
+        future = submit(kind, stats, fmt)
+        if future is None:
+            return None
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), settings.RECIPES_CHART_TIMEOUT)
+        except (asyncio.TimeoutError, concurrent.futures.TimeoutError):
+            logger.warning('%s chart render timed out', kind)
+            return None
+        except Exception:
+            logger.exception('%s chart render failed', kind)
+            return None
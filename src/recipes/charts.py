@@ -0,0 +1,93 @@
+"""Chart rendering with matplotlib's object-oriented API.
+
+Nothing here touches pyplot's global state or Django, so the functions are
+safe to call from any thread and can be run in worker processes.
+"""
+from io import BytesIO
+
+from matplotlib.figure import Figure
+
+
+def most_common(counts):
+    # Largest first, like pandas value_counts
+    return sorted(counts.items(), key=lambda item: item[1], reverse=True)
+
+def save_chart(fig, fmt):
+    # Write the figure to bytes
+    buffer = BytesIO()
+    fig.savefig(buffer, format=fmt, bbox_inches='tight', dpi=150)
+    
+    return buffer.getvalue()
+
+def create_cooking_time_pie_chart(stats, fmt='png'):
+    labels, counts = zip(*most_common(stats['time_category']))
+    
+    fig = Figure(figsize=(10, 8))
+    ax = fig.subplots()
+    colors = ['#ff6b35', '#e85a14', '#ff9f80', '#cc4400']
+    
+    ax.pie(counts, labels=labels, autopct='%1.1f%%',
+           startangle=90, colors=colors)
+    ax.set_title('Recipe Distribution by Cooking Time', fontsize=16, fontweight='bold')
+    
+    return save_chart(fig, fmt)
+
+def create_difficulty_bar_chart(stats, fmt='png'):
+    labels, counts = zip(*most_common(stats['difficulty']))
+    
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    bars = ax.bar(labels, counts, 
+                  color=['#90EE90', '#FFD700', '#FF6347'])
+    
+    ax.set_title('Recipe Distribution by Difficulty Level', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Difficulty Level', fontsize=12)
+    ax.set_ylabel('Number of Recipes', fontsize=12)
+    
+    # Add value labels on bars
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+                f'{int(height)}', ha='center', va='bottom')
+    
+    ax.grid(axis='y', alpha=0.3)
+    
+    return save_chart(fig, fmt)
+
+def create_cooking_time_line_chart(stats, fmt='png'):
+    # Create cooking time ranges up to the longest recipe
+    last_range = max(stats['time_range'], default=-1)
+    range_counts = []
+    range_labels = []
+    
+    for i in range(last_range + 1):
+        start = i * 10
+        range_counts.append(stats['time_range'].get(i, 0))
+        range_labels.append(f'{start}-{start + 9}')
+    
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.plot(range_labels, range_counts, marker='o', linewidth=2, 
+            markersize=8, color='#ff6b35')
+    ax.fill_between(range_labels, range_counts, alpha=0.3, color='#ff6b35')
+    
+    ax.set_title('Recipe Count by Cooking Time Range', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Cooking Time Range (minutes)', fontsize=12)
+    ax.set_ylabel('Number of Recipes', fontsize=12)
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.grid(True, alpha=0.3)
+    
+    return save_chart(fig, fmt)
+
+CHART_RENDERERS = {
+    'pie': create_cooking_time_pie_chart,
+    'bar': create_difficulty_bar_chart,
+    'line': create_cooking_time_line_chart,
+}
+
+def render(kind, stats, fmt='png'):
+    return CHART_RENDERERS[kind](stats, fmt)
+
+def warm_up():
+    # Draw a throwaway chart so fonts and the Agg backend are loaded before real requests
+    render('bar', {'difficulty': {'Easy': 1}}, 'png')
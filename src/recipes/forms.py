@@ -14,7 +14,11 @@ class RecipeSearchForm(forms.Form):
         required=False,
         widget=forms.TextInput(attrs={
             'placeholder': 'Search by recipe name...',
-            'class': 'form-control'
+            'class': 'form-control',
+            # Suggestions from the autocomplete endpoint (recipes/js/autocomplete.js)
+            'list': 'recipe-name-suggestions',
+            'autocomplete': 'off',
+            'data-autocomplete': 'name',
         })
     )
     
@@ -23,10 +27,24 @@ class RecipeSearchForm(forms.Form):
         required=False,
         widget=forms.TextInput(attrs={
             'placeholder': 'Search by ingredients...',
-            'class': 'form-control'
+            'class': 'form-control',
+            'list': 'ingredient-suggestions',
+            'autocomplete': 'off',
+            'data-autocomplete': 'ingredients',
         })
     )
     
+    INGREDIENT_MATCH_CHOICES = [
+        ('any', 'Any of these ingredients'),
+        ('all', 'All of these ingredients'),
+    ]
+    
+    ingredient_match = forms.ChoiceField(
+        choices=INGREDIENT_MATCH_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    
     cooking_time_min = forms.IntegerField(
         required=False,
         min_value=0,
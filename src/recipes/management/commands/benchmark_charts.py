@@ -0,0 +1,122 @@
+import random
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from recipes.models import Recipe
+from recipes import svg_charts
+from recipes.stats import rebuild_recipe_stats
+from recipes.views import TIME_CATEGORIES, asummary_stats, recipe_stats
+
+
+def legacy_stats(recipes_queryset):
+    # The original pandas implementation: a Python call per row for the pie
+    # categories and a full rescan of the frame for every 10 minute range
+    import pandas as pd
+
+    df = pd.DataFrame(list(recipes_queryset.values('cooking_time', 'difficulty')))
+
+    def categorize_time(minutes):
+        for limit, label in TIME_CATEGORIES[:-1]:
+            if minutes <= limit:
+                return label
+        return TIME_CATEGORIES[-1][1]
+
+    time_category = df['cooking_time'].apply(categorize_time).value_counts()
+    difficulty = df['difficulty'].value_counts()
+    time_ranges = range(0, int(df['cooking_time'].max()) + 10, 10)
+    time_range = [
+        len(df[(df['cooking_time'] >= start) & (df['cooking_time'] < start + 10)])
+        for start in time_ranges
+    ]
+    return time_category, difficulty, time_range
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = "Benchmark chart statistics against synthetic recipe tables of increasing size"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--skip-legacy", action="store_true", help="Only time the SQL aggregate")
+        parser.add_argument("--skip-render", action="store_true",
+                            help="Don't compare the matplotlib and SVG chart backends")
+
+    def seed(self, count, rng):
+        difficulties = [choice for choice, _ in Recipe.DIFFICULTY_CHOICES]
+        # bulk_create skips Recipe.save, which keeps seeding fast
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    name=f"Synthetic recipe {i}",
+                    ingredients="",
+                    cooking_time=rng.randint(1, 240),
+                    difficulty=rng.choice(difficulties),
+                )
+                for i in range(count)
+            ),
+            batch_size=5000,
+        )
+
+    def handle(self, *args, **options):
+        legacy = not options["skip_legacy"]
+        if legacy:
+            try:
+                import pandas  # noqa: F401
+            except ImportError:
+                self.stderr.write("pandas is not installed, skipping the legacy implementation")
+                legacy = False
+
+        # Seed a throwaway test database, never the configured one
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            rng = random.Random(0)
+            self.stdout.write(f"{'recipes':>10} {'aggregate ms':>14} {'stats table ms':>16} {'legacy ms':>12}")
+            for size in sorted(options["sizes"]):
+                self.seed(size - Recipe.objects.count(), rng)
+                # Seeding skips the signals that maintain the statistics table
+                rebuild_recipe_stats()
+                recipes = Recipe.objects.all()
+                aggregate = best_of(options["repeat"], recipe_stats, recipes) * 1000
+                summary = best_of(options["repeat"], async_to_sync(asummary_stats)) * 1000
+                line = f"{size:>10} {aggregate:>14.1f} {summary:>16.1f}"
+                if legacy:
+                    line += f" {best_of(options['repeat'], legacy_stats, recipes) * 1000:>12.1f}"
+                self.stdout.write(line)
+            if not options["skip_render"]:
+                self.compare_renderers(recipe_stats(Recipe.objects.all()), options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def compare_renderers(self, stats, repeat):
+        # Rendering only depends on the aggregated counts, not the table size
+        from recipes import charts
+        charts.warm_up()
+        self.stdout.write("")
+        self.stdout.write(f"{'chart':>6} {'matplotlib png ms':>18} {'matplotlib svg ms':>18} {'svg backend ms':>15}")
+        for kind in charts.CHART_RENDERERS:
+            timings = [
+                best_of(repeat, charts.render, kind, stats, "png"),
+                best_of(repeat, charts.render, kind, stats, "svg"),
+                best_of(repeat, svg_charts.render, kind, stats, "svg"),
+            ]
+            sizes = [
+                len(charts.render(kind, stats, "png")),
+                len(charts.render(kind, stats, "svg")),
+                len(svg_charts.render(kind, stats, "svg")),
+            ]
+            self.stdout.write(f"{kind:>6} " + " ".join(
+                f"{f'{timing * 1000:.2f} ({size // 1024} KiB)':>{width}}"
+                for timing, size, width in zip(timings, sizes, (18, 18, 15))
+            ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from recipes.cache import invalidate_recipes
+from recipes.models import Recipe
+from recipes.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Generate missing thumbnails for existing recipe pictures"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regenerate thumbnails that already exist")
+
+    def handle(self, *args, **options):
+        written = 0
+        # Recipes without an upload share the default picture, so handle each file once
+        field = Recipe._meta.get_field("pic")
+        names = set(Recipe.objects.values_list("pic", flat=True).distinct())
+        for name in sorted(names | {field.default}):
+            if not name:
+                continue
+            field_file = field.attr_class(None, field, name)
+            try:
+                written += len(generate_thumbnails(field_file, force=options["force"]))
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f"Skipped {name}: {exc}")
+        if written:
+            # Cached pages and recipe cards were rendered without the new srcsets
+            invalidate_recipes()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} thumbnails"))
@@ -0,0 +1,218 @@
+import csv
+import json
+import time
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.cache import invalidate_recipes
+from recipes.models import Recipe, bulk_sync_ingredients, calculate_difficulties, count_ingredients
+from recipes.similarity import rebuild_similar_recipes, update_similar_recipes
+from recipes.stats import adjust_recipe_stats
+
+from .export_recipes import detect_format, open_stream
+
+# Similar recipe lists are updated one imported recipe at a time (about
+# 100 ms each with 142k recipes) unless more than this fraction of the table
+# was imported, when one rebuild (about 1 ms per recipe) is cheaper
+SIMILAR_REBUILD_FRACTION = 1 / 100
+
+
+def read_rows(stream, fmt):
+    # One dict per recipe, read lazily so the file is never held in memory
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def text_field(row, field):
+    # JSON rows can hold any type; numbers are taken as text, anything else
+    # (lists, objects, booleans) is a bad row
+    value = row.get(field)
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be text")
+    return value.strip()
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Import recipes from a CSV or JSON Lines file (as written by export_recipes) "
+        "in batches, copying their pictures into MEDIA_ROOT/recipes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or - for stdin")
+        parser.add_argument("--format", choices=["csv", "jsonl"])
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows written per query")
+        parser.add_argument("--pictures-dir", default=".",
+                            help="Directory that relative picture paths are resolved against")
+        parser.add_argument("--update", action="store_true",
+                            help="Update recipes whose id already exists instead of adding a copy")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        fmt = detect_format(options["path"], options["format"])
+        self.pictures_dir = Path(options["pictures_dir"])
+        self.copied_pictures = {}
+        created = updated = skipped = 0
+        self.imported_ids = []
+
+        start = time.perf_counter()
+        try:
+            with open_stream(options["path"], "r") as stream:
+                rows = enumerate(read_rows(stream, fmt), start=1)
+                for batch in batches(rows, options["batch_size"]):
+                    recipes = []
+                    for line, row in batch:
+                        try:
+                            recipes.append(self.build_recipe(row))
+                        except (TypeError, ValueError) as err:
+                            skipped += 1
+                            self.stderr.write(f"Row {line} skipped: {err}")
+                    batch_created, batch_updated = self.save_batch(recipes, options)
+                    created += batch_created
+                    updated += batch_updated
+        except FileNotFoundError as err:
+            raise CommandError(err)
+        except (csv.Error, json.JSONDecodeError) as err:
+            raise CommandError(f"Could not read {options['path']}: {err}")
+        finally:
+            # Batches are committed one at a time, so the ones written before
+            # a failure need their similar recipes too
+            if self.imported_ids:
+                self.update_similar_recipes()
+        elapsed = time.perf_counter() - start
+
+        total = created + updated
+        self.stdout.write(
+            f"Imported {total} recipes ({created} created, {updated} updated, {skipped} skipped) "
+            f"in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} rows/sec)"
+        )
+
+    def update_similar_recipes(self):
+        # bulk_sync_ingredients doesn't update the similar recipe lists either
+        if len(self.imported_ids) > Recipe.objects.count() * SIMILAR_REBUILD_FRACTION:
+            rebuild_similar_recipes()
+            invalidate_recipes()
+        else:
+            update_similar_recipes(self.imported_ids)
+
+    def build_recipe(self, row):
+        name = text_field(row, "name")
+        if not name:
+            raise ValueError("name is required")
+        ingredients = row.get("ingredients")
+        if isinstance(ingredients, list):
+            ingredients = ", ".join(ingredients)
+        else:
+            ingredients = text_field(row, "ingredients")
+        difficulty = text_field(row, "difficulty")
+        if difficulty and difficulty not in dict(Recipe.DIFFICULTY_CHOICES):
+            raise ValueError(f"unknown difficulty {difficulty!r}")
+        pk = row.get("id")
+        return Recipe(
+            pk=int(pk) if pk not in (None, "") else None,
+            name=name,
+            ingredients=ingredients,
+            ingredient_count=count_ingredients(ingredients),
+            cooking_time=int(row.get("cooking_time")),
+            difficulty=difficulty,
+            pic=self.import_picture(text_field(row, "pic")),
+        )
+
+    def import_picture(self, value):
+        field = Recipe._meta.get_field("pic")
+        if not value:
+            return field.default
+        # Relative to MEDIA_ROOT or --pictures-dir, and never outside them
+        if Path(value).is_absolute() or ".." in Path(value).parts:
+            raise ValueError(f"picture path {value!r} must be relative, without '..'")
+        # Already in media storage, e.g. a file written by export_recipes
+        if field.storage.exists(value):
+            return value
+        source = self.pictures_dir / value
+        if source not in self.copied_pictures:
+            if not source.is_file():
+                self.stderr.write(f"Picture {value} not found, using the default picture")
+                return field.default
+            with source.open("rb") as picture:
+                self.copied_pictures[source] = field.storage.save(
+                    field.generate_filename(None, source.name), File(picture)
+                )
+        return self.copied_pictures[source]
+
+    def save_batch(self, recipes, options):
+        # Fill in missing difficulties for the whole batch at once, and flag
+        # the given ones that differ, using the same rule as Recipe.save
+        difficulties = calculate_difficulties(
+            [recipe.cooking_time for recipe in recipes],
+            [recipe.ingredient_count for recipe in recipes],
+        )
+        for recipe, difficulty in zip(recipes, difficulties):
+            recipe.difficulty = recipe.difficulty or difficulty
+            recipe.difficulty_override = recipe.difficulty != difficulty
+
+        with transaction.atomic():
+            # pk -> (difficulty, cooking_time) of the rows about to be replaced
+            existing = {}
+            if options["update"]:
+                existing = {
+                    pk: (difficulty, cooking_time)
+                    for pk, difficulty, cooking_time in Recipe.objects.filter(
+                        pk__in=[recipe.pk for recipe in recipes if recipe.pk]
+                    ).values_list("pk", "difficulty", "cooking_time")
+                }
+            to_update = [recipe for recipe in recipes if recipe.pk in existing]
+            to_create = [recipe for recipe in recipes if recipe.pk not in existing]
+            for recipe in to_create:
+                # Ids from another database are not kept
+                recipe.pk = None
+            # bulk_update doesn't apply auto_now
+            now = timezone.now()
+            for recipe in to_update:
+                recipe.updated_at = now
+
+            Recipe.objects.bulk_create(to_create, batch_size=options["batch_size"])
+            Recipe.objects.bulk_update(
+                to_update,
+                [
+                    "name", "ingredients", "ingredient_count", "cooking_time", "difficulty",
+                    "difficulty_override", "pic", "updated_at",
+                ],
+                batch_size=options["batch_size"],
+            )
+            bulk_sync_ingredients(recipes)
+            # Bulk writes skip the signals that keep the statistics current
+            changes = Counter((recipe.difficulty, recipe.cooking_time) for recipe in recipes)
+            changes.subtract(existing[recipe.pk] for recipe in to_update)
+            adjust_recipe_stats(changes)
+        # bulk writes skip the post_save signal, so invalidate cached pages
+        # here, once the batch is committed
+        if recipes:
+            invalidate_recipes([recipe.pk for recipe in to_update])
+        self.imported_ids += [recipe.pk for recipe in recipes]
+
+        copied = set(self.copied_pictures.values())
+        for recipe in recipes:
+            if recipe.pic.name in copied:
+                recipe.build_thumbnails()
+        return len(to_create), len(to_update)
@@ -0,0 +1,95 @@
+import http.cookiejar
+import re
+import statistics
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def percentile(timings, percent):
+    # Nearest-rank percentile of the sorted timings
+    index = max(0, min(len(timings) - 1, round(percent / 100 * len(timings)) - 1))
+    return timings[index]
+
+
+def open_session(base_url, username, password):
+    # A cookie-keeping opener, logged in through the login form when credentials are given
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    if username:
+        login_url = urllib.parse.urljoin(base_url, "/login/")
+        try:
+            page = opener.open(login_url).read().decode()
+        except urllib.error.URLError as err:
+            raise CommandError(f"Could not reach {base_url}: {err.reason}")
+        token = CSRF_INPUT.search(page)
+        data = urllib.parse.urlencode({
+            "username": username,
+            "password": password,
+            "csrfmiddlewaretoken": token.group(1) if token else "",
+        }).encode()
+        response = opener.open(urllib.request.Request(login_url, data=data, headers={"Referer": login_url}))
+        if urllib.parse.urlparse(response.geturl()).path == "/login/":
+            raise CommandError(f"Could not log in to {base_url} as {username}")
+    return opener
+
+
+class Command(BaseCommand):
+    help = (
+        "Send concurrent requests to running deployments (e.g. the WSGI and ASGI "
+        "servers) and report requests/sec and latency percentiles for each"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("base_urls", nargs="+", help="e.g. http://127.0.0.1:8000 http://127.0.0.1:8001")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help="Path to request, may be repeated (default: /recipes/)")
+        parser.add_argument("--requests", type=int, default=500, help="Requests per deployment")
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--username")
+        parser.add_argument("--password", default="")
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or ["/recipes/"]
+        concurrency = options["concurrency"]
+        self.stdout.write(f"{'deployment':<32}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+
+        for base_url in options["base_urls"]:
+            # One logged in session per client thread, created before the clock starts
+            sessions = [
+                open_session(base_url, options["username"], options["password"])
+                for _ in range(concurrency)
+            ]
+            urls = [urllib.parse.urljoin(base_url, path) for path in paths]
+
+            def fetch(i):
+                opener = sessions[i % concurrency]
+                start = time.perf_counter()
+                try:
+                    with opener.open(urls[i % len(urls)]) as response:
+                        response.read()
+                    ok = True
+                except (urllib.error.URLError, OSError):
+                    ok = False
+                return ok, time.perf_counter() - start
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(fetch, range(options["requests"])))
+            elapsed = time.perf_counter() - start
+
+            timings = sorted(duration for ok, duration in results if ok)
+            errors = len(results) - len(timings)
+            if not timings:
+                self.stdout.write(f"{base_url:<32}{len(results):>10}{errors:>8}{'-':>10}{'-':>10}{'-':>10}")
+                continue
+            self.stdout.write(
+                f"{base_url:<32}{len(results):>10}{errors:>8}{len(timings) / elapsed:>10.1f}"
+                f"{statistics.median(timings) * 1000:>10.1f}{percentile(timings, 99) * 1000:>10.1f}"
+            )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.cache import invalidate_recipes
+from recipes.similarity import rebuild_similar_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every recipe's similar recipes list from the ingredient table, "
+        "e.g. after migrating or after writes that skipped Recipe.save"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, help="Similar recipes kept per recipe (default RECIPES_SIMILAR_COUNT)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = rebuild_similar_recipes(options["count"])
+        # Every cached detail page shows an old list
+        invalidate_recipes()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {written} similar recipes in {time.perf_counter() - start:.1f}s"
+        ))
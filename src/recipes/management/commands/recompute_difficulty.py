@@ -0,0 +1,73 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Now
+
+from recipes.cache import invalidate_recipes
+from recipes.models import Recipe, count_ingredients, difficulty_expression
+from recipes.stats import rebuild_recipe_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-derive every calculated recipe difficulty from its cooking time and ingredient count "
+        "in one UPDATE; hand-picked difficulties are left alone"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recount", action="store_true",
+                            help="First recount ingredients, for rows changed without Recipe.save")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per recount update")
+        parser.add_argument("--dry-run", action="store_true", help="Only report the changes")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recounted = self.recount(options) if options["recount"] else 0
+            # Only touch calculated rows whose difficulty is out of date
+            stale = Recipe.objects.filter(difficulty_override=False).exclude(difficulty=difficulty_expression())
+            transitions = list(
+                stale.values("difficulty").annotate(derived=difficulty_expression(), count=Count("id"))
+                .order_by("difficulty", "derived").values_list("difficulty", "derived", "count")
+            )
+            if options["dry_run"]:
+                changed = sum(count for _, _, count in transitions)
+                transaction.set_rollback(True)
+            else:
+                changed = stale.update(difficulty=difficulty_expression(), updated_at=Now())
+                if changed:
+                    # The UPDATE skips the signals that keep the statistics current
+                    rebuild_recipe_stats()
+
+        if (changed or recounted) and not options["dry_run"]:
+            invalidate_recipes()
+        verb = "Would update" if options["dry_run"] else "Updated"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} the difficulty of {changed} recipes ({recounted} ingredient counts corrected)"
+        ))
+        for old, new, count in transitions:
+            self.stdout.write(f"  {old or '(none)'} -> {new}: {count}")
+        overrides = Recipe.objects.filter(difficulty_override=True).count()
+        if overrides:
+            self.stdout.write(f"{overrides} hand-picked difficulties left alone")
+
+    def recount(self, options):
+        # Group the wrong rows by their real count: an UPDATE per count and
+        # batch of ids is much cheaper than bulk_update's CASE per row
+        recipe_ids = defaultdict(list)
+        rows = Recipe.objects.values_list("id", "ingredients", "ingredient_count").iterator(
+            chunk_size=options["batch_size"]
+        )
+        for recipe_id, ingredients, stored in rows:
+            count = count_ingredients(ingredients)
+            if count != stored:
+                recipe_ids[count].append(recipe_id)
+
+        batch_size = options["batch_size"]
+        for count, ids in recipe_ids.items():
+            for start in range(0, len(ids), batch_size):
+                Recipe.objects.filter(id__in=ids[start:start + batch_size]).update(
+                    ingredient_count=count, updated_at=Now()
+                )
+        return sum(len(ids) for ids in recipe_ids.values())
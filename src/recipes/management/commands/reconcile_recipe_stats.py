@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipes.cache import invalidate_recipes
+from recipes.stats import rebuild_recipe_stats, stats_differences
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the stored recipe statistics with a fresh count of the recipe table "
+        "and rebuild them if they have drifted, e.g. after writes that skipped Recipe.save"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report the differences")
+
+    def handle(self, *args, **options):
+        differences = stats_differences()
+        for (difficulty, cooking_time), (stored, actual) in sorted(differences.items()):
+            self.stdout.write(f"{difficulty or '(none)'}, {cooking_time} min: stored {stored}, counted {actual}")
+        if not differences:
+            self.stdout.write(self.style.SUCCESS("Recipe statistics are up to date"))
+            return
+        if options["dry_run"]:
+            self.stdout.write(f"{len(differences)} counts are wrong")
+            return
+        rebuild_recipe_stats()
+        # Cached dashboards were built from the wrong counts
+        invalidate_recipes()
+        self.stdout.write(self.style.SUCCESS(f"Corrected {len(differences)} counts"))
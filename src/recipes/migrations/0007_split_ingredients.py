@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def split_ingredients(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    Ingredient = apps.get_model("recipes", "Ingredient")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+
+    # Same normalization as recipes.models.split_ingredients
+    recipe_names = {}
+    for recipe_id, text in Recipe.objects.values_list("id", "ingredients").iterator():
+        names = []
+        for part in (text or "").split(","):
+            name = " ".join(part.split()).lower()[:100]
+            if name and name not in names:
+                names.append(name)
+        recipe_names[recipe_id] = names
+
+    all_names = {name for names in recipe_names.values() for name in names}
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=name) for name in all_names], ignore_conflicts=True
+    )
+    ingredient_ids = dict(Ingredient.objects.values_list("name", "id"))
+    RecipeIngredient.objects.bulk_create(
+        [
+            RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_ids[name])
+            for recipe_id, names in recipe_names.items()
+            for name in names
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0006_ingredient"),
+    ]
+
+    operations = [
+        migrations.RunPython(split_ingredients, migrations.RunPython.noop),
+    ]
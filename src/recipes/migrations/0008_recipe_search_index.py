@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# The index as this migration created it, frozen so later changes to
+# recipes.search don't change what it does (0013 drops the ingredients)
+FTS_TABLE = "recipes_recipe_fts"
+
+SQLITE_SEARCH_INDEX = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, ingredients,
+        content='recipes_recipe', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, ingredients) VALUES (new.id, new.name, new.ingredients);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, ingredients)
+        VALUES ('delete', old.id, old.name, old.ingredients);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF name, ingredients ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, ingredients)
+        VALUES ('delete', old.id, old.name, old.ingredients);
+        INSERT INTO {FTS_TABLE}(rowid, name, ingredients) VALUES (new.id, new.name, new.ingredients);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+POSTGRES_SEARCH_INDEX = [
+    """CREATE INDEX IF NOT EXISTS recipe_name_search_idx ON recipes_recipe
+        USING GIN (to_tsvector('simple'::regconfig, COALESCE(name, '')))""",
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {
+        "sqlite": SQLITE_SEARCH_INDEX,
+        "postgresql": POSTGRES_SEARCH_INDEX,
+    }.get(schema_editor.connection.vendor, [])
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        if schema_editor.connection.vendor == "sqlite":
+            for suffix in ("insert", "delete", "update"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif schema_editor.connection.vendor == "postgresql":
+            cursor.execute("DROP INDEX IF EXISTS recipe_name_search_idx")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0007_split_ingredients"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+def count_recipes(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeStats = apps.get_model("recipes", "RecipeStats")
+    rows = (
+        Recipe.objects.order_by()
+        .values("difficulty", "cooking_time")
+        .annotate(count=models.Count("id"))
+    )
+    RecipeStats.objects.bulk_create(RecipeStats(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0010_recipe_timestamps"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("difficulty", models.CharField(blank=True, max_length=20)),
+                ("cooking_time", models.IntegerField()),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("difficulty", "cooking_time"), name="unique_recipe_stats"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The name-only index, frozen like 0008's
+FTS_TABLE = "recipes_recipe_fts"
+
+SQLITE_SEARCH_INDEX = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name,
+        content='recipes_recipe', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF name ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def reindex_names_only(apps, schema_editor):
+    # The index used to cover ingredients too; CREATE ... IF NOT EXISTS
+    # would keep the old table and triggers
+    if schema_editor.connection.vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            for statement in SQLITE_SEARCH_INDEX:
+                cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0012_recipesimilarity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeSearchEntry",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_entry",
+                        serialize=False,
+                        to="recipes.recipe",
+                    ),
+                ),
+                ("name", models.TextField()),
+            ],
+            options={
+                "db_table": "recipes_recipe_fts",
+                "managed": False,
+            },
+        ),
+        migrations.RunPython(reindex_names_only, migrations.RunPython.noop),
+    ]
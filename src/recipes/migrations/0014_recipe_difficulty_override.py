@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:41
+
+from django.db import migrations, models
+
+# The difficulty rule when this migration was written: (difficulty, cooking
+# time under, ingredient count under), anything else is Hard
+DIFFICULTY_RULES = [
+    ("Easy", 30, 5),
+    ("Medium", 60, 10),
+]
+
+
+def flag_overrides(apps, schema_editor):
+    # A stored difficulty the rule doesn't give was picked by hand
+    Recipe = apps.get_model("recipes", "Recipe")
+    derived = models.Case(
+        *[
+            models.When(cooking_time__lt=time_limit, ingredient_count__lt=count_limit, then=models.Value(difficulty))
+            for difficulty, time_limit, count_limit in DIFFICULTY_RULES
+        ],
+        default=models.Value("Hard"),
+        output_field=models.CharField(),
+    )
+    Recipe.objects.exclude(difficulty="").exclude(difficulty=derived).update(difficulty_override=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0013_recipe_search_name_only"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="difficulty_override",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(flag_overrides, migrations.RunPython.noop),
+    ]
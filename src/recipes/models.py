@@ -1,4 +1,91 @@
-from django.db import models
+from django.db import models, transaction
+
+from .search import FTS_TABLE, Match
+from .thumbnails import existing_thumbnails, generate_thumbnails
+
+
+def split_ingredients(text):
+    """Split a comma-separated ingredient list into normalized, unique names."""
+    names = []
+    for part in (text or '').split(','):
+        name = ' '.join(part.split()).lower()[:100]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+# (difficulty, cooking time under, ingredient count under), checked in order;
+# anything else is Hard
+DIFFICULTY_RULES = [
+    ('Easy', 30, 5),
+    ('Medium', 60, 10),
+]
+
+
+def count_ingredients(text):
+    # Non-blank comma-separated entries; duplicates count, as they always have
+    return len([i for i in (text or '').split(',') if i.strip()])
+
+
+def calculate_difficulty(cooking_time, ingredient_count):
+    for difficulty, time_limit, count_limit in DIFFICULTY_RULES:
+        if cooking_time < time_limit and ingredient_count < count_limit:
+            return difficulty
+    return 'Hard'
+
+
+def calculate_difficulties(cooking_times, ingredient_counts):
+    """Vectorized calculate_difficulty() for a batch of recipes."""
+    import numpy as np
+    cooking_times = np.asarray(cooking_times)
+    ingredient_counts = np.asarray(ingredient_counts)
+    conditions = [
+        (cooking_times < time_limit) & (ingredient_counts < count_limit)
+        for _, time_limit, count_limit in DIFFICULTY_RULES
+    ]
+    choices = [difficulty for difficulty, _, _ in DIFFICULTY_RULES]
+    return np.select(conditions, choices, default='Hard').tolist()
+
+
+def difficulty_expression():
+    """calculate_difficulty() as a database expression over the recipe columns."""
+    return models.Case(
+        *[
+            models.When(cooking_time__lt=time_limit, ingredient_count__lt=count_limit, then=models.Value(difficulty))
+            for difficulty, time_limit, count_limit in DIFFICULTY_RULES
+        ],
+        default=models.Value('Hard'),
+        output_field=models.CharField(),
+    )
+
+
+def bulk_sync_ingredients(recipes):
+    """Recipe.sync_ingredients() for many saved recipes in a few queries.
+
+    For recipes written with bulk_create/bulk_update, which skip save().
+    """
+    names = {recipe.pk: split_ingredients(recipe.ingredients) for recipe in recipes}
+    all_names = {name for recipe_names in names.values() for name in recipe_names}
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=name) for name in all_names], ignore_conflicts=True
+    )
+    ids = dict(Ingredient.objects.filter(name__in=all_names).values_list('name', 'id'))
+    RecipeIngredient.objects.filter(recipe__in=list(names)).delete()
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe_id=pk, ingredient_id=ids[name])
+        for pk, recipe_names in names.items() for name in recipe_names
+    ])
+    for recipe in recipes:
+        recipe._loaded_ingredients = recipe.ingredients
+
+
+class Ingredient(models.Model):
+    # Stored normalized (see split_ingredients); unique so lookups use the index
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return str(self.name)
+
 
 # Create your models here.
 class Recipe(models.Model):
@@ -12,19 +99,182 @@ class Recipe(models.Model):
     ingredients = models.TextField()
     cooking_time = models.IntegerField()
     difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES, blank=True)
+    # Set when the difficulty was picked rather than calculated, so
+    # recompute_difficulty leaves it alone
+    difficulty_override = models.BooleanField(default=False, editable=False)
     pic = models.ImageField(upload_to="recipes", default="no_picture.jpeg")
+    # Derived from `ingredients` on save, so difficulty can be recomputed in SQL
+    ingredient_count = models.PositiveIntegerField(default=0, editable=False)
+    # Last-Modified for cached pages; bulk update paths must set updated_at themselves
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Normalized copy of `ingredients`, kept in sync on save
+    ingredient_list = models.ManyToManyField(
+        Ingredient, through='RecipeIngredient', related_name='recipes', blank=True
+    )
+
+    class Meta:
+        indexes = [
+            # Serves the list ordering and keyset pagination cursors
+            models.Index(fields=['cooking_time', 'id'], name='recipe_time_id_idx'),
+            # Serves the search form's difficulty filter, alone or with a time range
+            models.Index(fields=['difficulty', 'cooking_time'], name='recipe_difficulty_time_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so save() only redoes work for changed fields
+        instance._loaded_ingredients = instance.__dict__.get('ingredients')
+        instance._loaded_pic = instance.__dict__.get('pic')
+        instance._loaded_difficulty = (
+            instance.__dict__.get('difficulty'),
+            instance.__dict__.get('cooking_time'),
+            instance.__dict__.get('ingredient_count'),
+        )
+        return instance
+
+    def difficulty_is_derived(self):
+        # True if the stored difficulty is what the rule gave for the stored
+        # values, i.e. it was calculated rather than picked by hand
+        difficulty, cooking_time, ingredient_count = getattr(self, '_loaded_difficulty', (None, None, None))
+        if None in (difficulty, cooking_time, ingredient_count):
+            return False
+        return difficulty == calculate_difficulty(cooking_time, ingredient_count)
 
     def save(self, *args, **kwargs):
-        # Auto-calculate difficulty if not set
-        if not self.difficulty:
-            ingredient_count = len([i.strip() for i in self.ingredients.split(',') if i.strip()])
-            if self.cooking_time < 30 and ingredient_count < 5:
-                self.difficulty = 'Easy'
-            elif self.cooking_time < 60 and ingredient_count < 10:
-                self.difficulty = 'Medium'
-            else:
-                self.difficulty = 'Hard'
-        super().save(*args, **kwargs)
+        self.ingredient_count = count_ingredients(self.ingredients)
+        # Auto-calculate difficulty if not set, and keep a calculated one
+        # current when the ingredients or cooking time change
+        if not self.difficulty or (
+            self.difficulty_is_derived() and self.difficulty == self._loaded_difficulty[0]
+        ):
+            self.difficulty = calculate_difficulty(self.cooking_time, self.ingredient_count)
+        self.difficulty_override = self.difficulty != calculate_difficulty(self.cooking_time, self.ingredient_count)
+        # A new upload may reuse a deleted picture's name, so also check for
+        # a file that isn't in storage yet
+        new_pic = self.pic.name != getattr(self, '_loaded_pic', None) or not self.pic._committed
+        # One transaction with the derived rows, so the caches are invalidated
+        # once all of them are committed (see signals)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._loaded_difficulty = (self.difficulty, self.cooking_time, self.ingredient_count)
+            if getattr(self, '_loaded_ingredients', None) != self.ingredients:
+                self.sync_ingredients()
+                # Scores come from the synced rows, so this can't wait for a signal
+                from .similarity import update_similar_recipes
+                update_similar_recipes([self.pk])
+        if new_pic:
+            # Thumbnails already on disk under this name belong to an older picture
+            self.build_thumbnails(force=True)
+
+    def build_thumbnails(self, force=False):
+        """Generate thumbnails for an uploaded picture; the shared default is left alone."""
+        self._loaded_pic = self.pic.name
+        if not self.pic or self.pic.name == self._meta.get_field('pic').default:
+            return []
+        try:
+            return generate_thumbnails(self.pic, force=force)
+        except (OSError, ValueError):
+            # Missing or unreadable image, the original is still served
+            return []
+
+    @property
+    def thumbnail_url(self):
+        # Smallest thumbnail, or the original picture if none were generated
+        thumbnails = existing_thumbnails(self.pic)
+        return thumbnails[0][0] if thumbnails else self.pic.url
+
+    @property
+    def thumbnail_srcset(self):
+        return ', '.join(f'{url} {width}w' for url, width in existing_thumbnails(self.pic))
+
+    def sync_ingredients(self):
+        """Link the recipe to an Ingredient row for every name in `ingredients`."""
+        names = split_ingredients(self.ingredients)
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name) for name in names], ignore_conflicts=True
+        )
+        self.ingredient_list.set(Ingredient.objects.filter(name__in=names))
+        self._loaded_ingredients = self.ingredients
+
+    def __str__(self):
+        return str(self.name)
+
+
+class RecipeIngredient(models.Model):
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'ingredient'], name='unique_recipe_ingredient'),
+        ]
+        indexes = [
+            # Ingredient searches join from the ingredient to its recipes
+            models.Index(fields=['ingredient', 'recipe'], name='ingredient_recipe_idx'),
+        ]
+
+
+class RecipeStats(models.Model):
+    """How many recipes share a difficulty and cooking time.
+
+    Kept current from the Recipe save/delete signals (see recipes.stats), so
+    the unfiltered dashboard reads a few hundred rows however many recipes
+    there are. A row per cooking time also gives the exact shortest, longest
+    and mean time (see views.bucket_stats). Bulk writes that skip the
+    signals must call rebuild_recipe_stats() or adjust_recipe_stats()
+    themselves.
+    """
+    difficulty = models.CharField(max_length=20, blank=True)
+    cooking_time = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['difficulty', 'cooking_time'], name='unique_recipe_stats'),
+        ]
 
     def __str__(self):
-        return str(self.name)
\ No newline at end of file
+        return f'{self.difficulty} {self.cooking_time} min: {self.count}'
+
+
+class RecipeSimilarity(models.Model):
+    """One of a recipe's most similar recipes, by shared ingredients.
+
+    The detail page reads a recipe's rows with one indexed query; they are
+    computed ahead of time by recipes.similarity, when a recipe's
+    ingredients change or by the rebuild_similar_recipes command.
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='similarities')
+    similar = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+')
+    # Jaccard index of the two ingredient sets, 0 to 1
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'similar'], name='unique_recipe_similarity'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}: {self.score:.2f}'
+
+
+class RecipeSearchEntry(models.Model):
+    """A row of the SQLite full-text index over recipe names (see recipes.search).
+
+    The FTS5 table is created and kept in sync by triggers, not the ORM; the
+    model only lets recipe queries join it, e.g. to rank results by bm25().
+    """
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_entry',
+    )
+    name = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = FTS_TABLE
+
+
+RecipeSearchEntry._meta.get_field('name').register_lookup(Match)
@@ -0,0 +1,124 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Lookup
+from django.db.models.expressions import RawSQL
+
+# SQLite FTS5 index over recipe names, kept in sync by triggers; searches only
+# ever match names, so ingredients aren't indexed
+FTS_TABLE = 'recipes_recipe_fts'
+
+SQLITE_SEARCH_INDEX = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name,
+        content='recipes_recipe', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF name ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+]
+
+# PostgreSQL expression index matching the SearchVector used in search_recipes
+POSTGRES_SEARCH_INDEX = [
+    """CREATE INDEX IF NOT EXISTS recipe_name_search_idx ON recipes_recipe
+        USING GIN (to_tsvector('simple'::regconfig, COALESCE(name, '')))""",
+]
+
+
+def install_search_index(conn=connection):
+    """Create the full-text index of recipe names for the database engine, if it has one.
+
+    Safe to run repeatedly; SQLite drops triggers when a migration rebuilds
+    the recipe table, so this also runs after every migrate.
+    """
+    statements = {
+        'sqlite': SQLITE_SEARCH_INDEX,
+        'postgresql': POSTGRES_SEARCH_INDEX,
+    }.get(conn.vendor, [])
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def rebuild_search_index(conn=connection):
+    install_search_index(conn)
+    if conn.vendor == 'sqlite':
+        with conn.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+class Match(Lookup):
+    """FTS5 `column MATCH query`, for RecipeSearchEntry.name."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+def search_terms(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def fts_query(text, column):
+    # Quote every term so user input can't inject FTS syntax; "*" adds prefix matching
+    return ' AND '.join(f'{column} : "{term}"*' for term in search_terms(text))
+
+
+def pg_query(text):
+    from django.contrib.postgres.search import SearchQuery
+    return SearchQuery(' & '.join(f'{term}:*' for term in search_terms(text)),
+                       search_type='raw', config='simple')
+
+
+def pg_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('name', config='simple')
+
+
+def search_recipes(recipes, text):
+    """Filter recipes to those whose name matches every word of text as a prefix."""
+    if not search_terms(text):
+        return recipes.filter(name__icontains=text)
+    
+    if connection.vendor == 'sqlite':
+        match = fts_query(text, 'name')
+        return recipes.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+        ))
+    
+    if connection.vendor == 'postgresql':
+        return recipes.annotate(name_search=pg_vector()).filter(name_search=pg_query(text))
+    
+    return recipes.filter(name__icontains=text)
+
+
+def rank_recipes(recipes, text):
+    """Annotate search_rank (higher is better) and order the best matches first."""
+    if not search_terms(text):
+        return recipes
+    
+    if connection.vendor == 'sqlite':
+        # Join the index once (through RecipeSearchEntry); a correlated bm25()
+        # subquery re-runs the MATCH for every matching row, which took
+        # seconds on broad searches. bm25() is lower for better matches, so negate it
+        rank = RawSQL(f'-bm25({FTS_TABLE})', [], output_field=FloatField())
+        return recipes.filter(
+            search_entry__name__match=fts_query(text, 'name'),
+        ).annotate(search_rank=rank).order_by('-search_rank', 'id')
+    
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchRank
+        rank = SearchRank(pg_vector(), pg_query(text))
+        return recipes.annotate(search_rank=rank).order_by('-search_rank', 'id')
+    
+    return recipes
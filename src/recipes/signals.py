@@ -0,0 +1,89 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_on_commit, invalidate_recipes
+from .models import Recipe
+from .search import install_search_index
+from .similarity import listed_by, recompute_similar_recipes
+from .stats import adjust_recipe_stats
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    # Any change to the recipe table invalidates every cached chart and
+    # list, plus the recipe's own detail page and those listing it as similar.
+    # Again after the commit: Recipe.save writes the ingredient and similarity
+    # rows after this signal, in the same transaction
+    invalidate_on_commit(invalidate_recipes, [instance.pk, *listed_by(instance.pk)])
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_similar_lists(sender, instance, **kwargs):
+    # The rows showing the recipe are deleted along with it
+    instance._listed_by = listed_by(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def refill_similar_lists(sender, instance, **kwargs):
+    # Those lists are one short now; the next best match is only known by
+    # comparing again
+    recompute_similar_recipes(getattr(instance, '_listed_by', []))
+
+
+def stored_stats_key(instance):
+    # The (difficulty, cooking_time) the recipe had in the database, if known
+    difficulty, cooking_time, _ = getattr(instance, '_loaded_difficulty', (None, None, None))
+    if cooking_time is None:
+        return None
+    return difficulty, cooking_time
+
+
+@receiver(pre_save, sender=Recipe)
+def load_stored_stats_key(sender, instance, **kwargs):
+    # A recipe saved without being loaded first, e.g. Recipe(pk=3, ...).save(),
+    # may still replace a row, whose old values the stats need
+    if instance.pk is not None and stored_stats_key(instance) is None:
+        stored = Recipe.objects.filter(pk=instance.pk).values_list('difficulty', 'cooking_time').first()
+        if stored:
+            instance._loaded_difficulty = (*stored, None)
+
+
+@receiver(post_save, sender=Recipe)
+def count_saved_recipe(sender, instance, created, **kwargs):
+    # Move the recipe between stats rows; Recipe.save updates
+    # _loaded_difficulty only after this has run
+    changes = Counter({(instance.difficulty, instance.cooking_time): 1})
+    old = None if created else stored_stats_key(instance)
+    if old:
+        changes[old] -= 1
+    adjust_recipe_stats(changes)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    old = stored_stats_key(instance) or (instance.difficulty, instance.cooking_time)
+    adjust_recipe_stats({old: -1})
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, using='default', **kwargs):
+    # SQLite drops the search triggers whenever a migration rebuilds the recipe table
+    connection = connections[using]
+    if sender.name == 'recipes' and Recipe._meta.db_table in connection.introspection.table_names():
+        install_search_index(connection)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    # Pragmas are per connection, so set them every time one is opened
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'RECIPES_SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
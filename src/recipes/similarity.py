@@ -0,0 +1,227 @@
+"""Precomputed "similar recipes" lists for the detail page.
+
+Two recipes are as similar as the Jaccard index of their ingredient sets:
+shared ingredients over the ingredients of both. Each recipe keeps its
+RECIPES_SIMILAR_COUNT best matches as RecipeSimilarity rows, best first and
+ties by id, so the page is one indexed lookup instead of a comparison with
+every other recipe.
+
+Changing one recipe's ingredients only changes its scores against the
+recipes it shares (or shared) an ingredient with, so update_similar_recipes()
+recomputes its own list and merges the new scores into those recipes' lists.
+rebuild_similar_recipes() recomputes every list at once.
+"""
+import heapq
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .cache import invalidate_detail_pages, invalidate_on_commit
+from .models import RecipeIngredient, RecipeSimilarity
+
+
+def similar_count():
+    return getattr(settings, 'RECIPES_SIMILAR_COUNT', 6)
+
+
+def jaccard(shared, size, other_size):
+    return shared / (size + other_size - shared)
+
+
+def best_matches(scores, count):
+    """The `count` best (id, score) pairs of {id: score}, best first, ties by id."""
+    return heapq.nsmallest(count, ((pk, score) for pk, score in scores.items() if score > 0),
+                           key=lambda item: (-item[1], item[0]))
+
+
+def listed_by(pk):
+    """Ids of the recipes whose list shows recipe pk."""
+    return list(RecipeSimilarity.objects.filter(similar_id=pk).values_list('recipe_id', flat=True))
+
+
+def match_rows(pk, lists=False):
+    """One row per other recipe sharing an ingredient with recipe pk.
+
+    Rows are (id, shared ingredients, ingredients), plus the length and
+    worst score of the recipe's stored list with `lists`. One GROUP BY over
+    the ingredient index; the counts are looked up once per matching recipe,
+    which the ORM can't express without grouping by them, i.e. counting
+    once per shared ingredient (4-5x slower).
+    """
+    ingredients = RecipeIngredient._meta.db_table
+    similarities = RecipeSimilarity._meta.db_table
+    columns = f'(SELECT COUNT(*) FROM {ingredients} r WHERE r.recipe_id = matches.recipe_id)'
+    if lists:
+        columns += (
+            f', (SELECT COUNT(*) FROM {similarities} s WHERE s.recipe_id = matches.recipe_id)'
+            f', (SELECT MIN(score) FROM {similarities} s WHERE s.recipe_id = matches.recipe_id)'
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH matches AS ('
+            f'SELECT recipe_id, COUNT(*) AS shared FROM {ingredients} '
+            f'WHERE ingredient_id IN (SELECT ingredient_id FROM {ingredients} WHERE recipe_id = %s) '
+            f'AND recipe_id <> %s GROUP BY recipe_id'
+            f') SELECT recipe_id, shared, {columns} FROM matches',
+            [pk, pk],
+        )
+        return cursor.fetchall()
+
+
+def similarity_scores(pk, rows=None):
+    """{recipe id: score} for every other recipe sharing an ingredient with recipe pk."""
+    if rows is None:
+        rows = match_rows(pk)
+    size = RecipeIngredient.objects.filter(recipe_id=pk).count()
+    return {row[0]: jaccard(row[1], size, row[2]) for row in rows}
+
+
+def stored_lists(pks):
+    """{recipe id: {similar id: score}} as stored, for the given recipes."""
+    pks = list(pks)
+    lists = {pk: {} for pk in pks}
+    # Chunked to stay under SQLite's query parameter limit
+    for start in range(0, len(pks), 500):
+        rows = RecipeSimilarity.objects.filter(recipe_id__in=pks[start:start + 500])
+        for recipe_id, similar_id, score in rows.values_list('recipe_id', 'similar_id', 'score'):
+            lists[recipe_id][similar_id] = score
+    return lists
+
+
+def save_list(pk, matches, stored):
+    """Store recipe pk's list if it differs from `stored`; returns whether it did."""
+    if dict(matches) == stored:
+        return False
+    RecipeSimilarity.objects.filter(recipe_id=pk).delete()
+    RecipeSimilarity.objects.bulk_create(
+        RecipeSimilarity(recipe_id=pk, similar_id=similar_id, score=score) for similar_id, score in matches
+    )
+    return True
+
+
+def recompute_list(pk, stored, count):
+    return save_list(pk, best_matches(similarity_scores(pk), count), stored)
+
+
+def merge_score(pk, changed_pk, score, stored, count):
+    """Recipe pk's new list after its score against changed_pk became `score`.
+
+    No other score of pk's changed, so the stored list still holds its best
+    matches among the rest. That's enough unless changed_pk drops out of a
+    full list, when the next best match isn't known: returns None then.
+    """
+    listed = dict(stored)
+    was_listed = listed.pop(changed_pk, None) is not None
+    candidates = {**listed, changed_pk: score} if score > 0 else listed
+    matches = best_matches(candidates, count)
+    if was_listed and len(stored) >= count:
+        # The stored rest is complete only if changed_pk still beats them all
+        # to the last place
+        worst = max(listed.items(), key=lambda item: (-item[1], item[0]), default=None)
+        if worst is None or (-score, changed_pk) > (-worst[1], worst[0]):
+            return None
+    return matches
+
+
+def update_recipe(pk, count):
+    """Update the lists that can change with recipe pk's ingredients; returns their ids."""
+    rows = match_rows(pk, lists=True)
+    scores = similarity_scores(pk, rows)
+    changed = set()
+    if save_list(pk, best_matches(scores, count), stored_lists([pk])[pk]):
+        changed.add(pk)
+
+    # The lists that show pk, and those that could take it in: lists that
+    # aren't full yet, or whose worst score pk's new score reaches
+    touched = set(listed_by(pk))
+    for other, _, _, length, worst in rows:
+        if length < count or scores[other] >= worst:
+            touched.add(other)
+    stored = stored_lists(touched)
+    for other in touched:
+        matches = merge_score(other, pk, scores.get(other, 0), stored[other], count)
+        if matches is None:
+            saved = recompute_list(other, stored[other], count)
+        else:
+            saved = save_list(other, matches, stored[other])
+        if saved:
+            changed.add(other)
+    return changed
+
+
+def update_similar_recipes(pks):
+    """Update the similarity lists after the ingredients of the given recipes changed.
+
+    Drops the cached detail pages whose lists changed and returns their ids.
+    """
+    count = similar_count()
+    changed = set()
+    with transaction.atomic():
+        for pk in pks:
+            changed |= update_recipe(pk, count)
+    invalidate_on_commit(invalidate_detail_pages, changed)
+    return changed
+
+
+def recompute_similar_recipes(pks):
+    """Recompute the lists of the given recipes from scratch, e.g. after one they showed was deleted."""
+    count = similar_count()
+    stored = stored_lists(pks)
+    with transaction.atomic():
+        changed = {pk for pk in stored if recompute_list(pk, stored[pk], count)}
+    invalidate_on_commit(invalidate_detail_pages, changed)
+    return changed
+
+
+def rebuild_similar_recipes(count=None, batch_size=5000):
+    """Recompute every recipe's list in memory; returns the number of rows written.
+
+    The (recipe, ingredient) pairs are loaded once into numpy arrays. For
+    each recipe the postings of its ingredients are concatenated and sorted,
+    so the run lengths are the shared ingredient counts.
+    """
+    import numpy as np
+    count = count or similar_count()
+    pairs = np.array(
+        RecipeIngredient.objects.order_by('recipe_id', 'ingredient_id').values_list('recipe_id', 'ingredient_id'),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    # Recipes and ingredients numbered 0..n-1; recipe numbers follow the ids
+    recipe_ids, recipes = np.unique(pairs[:, 0], return_inverse=True)
+    ingredient_ids, ingredients = np.unique(pairs[:, 1], return_inverse=True)
+    sizes = np.bincount(recipes, minlength=len(recipe_ids))
+    recipe_ids = recipe_ids.tolist()
+    starts = np.concatenate(([0], np.cumsum(sizes)))
+    by_ingredient = np.argsort(ingredients, kind='stable')
+    posting_starts = np.concatenate(([0], np.cumsum(np.bincount(ingredients, minlength=len(ingredient_ids)))))
+    postings = [
+        recipes[by_ingredient[posting_starts[i]:posting_starts[i + 1]]] for i in range(len(ingredient_ids))
+    ]
+
+    written = 0
+    rows = []
+    with transaction.atomic():
+        RecipeSimilarity.objects.all().delete()
+        for recipe in range(len(recipe_ids)):
+            matches = np.sort(np.concatenate([postings[i] for i in ingredients[starts[recipe]:starts[recipe + 1]]]))
+            firsts = np.flatnonzero(np.diff(matches, prepend=-1))
+            shared = np.diff(np.append(firsts, len(matches)))
+            matches = matches[firsts]
+            mine = matches != recipe
+            matches, shared = matches[mine], shared[mine]
+            scores = shared / (sizes[recipe] + sizes[matches] - shared)
+            if len(scores) > count:
+                # Everything tied with the last place, then best first, ties by id
+                keep = np.flatnonzero(scores >= np.partition(scores, -count)[-count])
+                matches, scores = matches[keep], scores[keep]
+            best = np.lexsort((matches, -scores))[:count]
+            rows.extend(
+                RecipeSimilarity(recipe_id=recipe_ids[recipe], similar_id=recipe_ids[match], score=score)
+                for match, score in zip(matches[best].tolist(), scores[best].tolist())
+            )
+            if len(rows) >= batch_size:
+                RecipeSimilarity.objects.bulk_create(rows)
+                written += len(rows)
+                rows = []
+        RecipeSimilarity.objects.bulk_create(rows)
+    return written + len(rows)
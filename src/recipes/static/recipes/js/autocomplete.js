@@ -0,0 +1,57 @@
+// Fills the search form's <datalist>s from the autocomplete endpoint as the
+// user types. Ingredient lists are completed one ingredient at a time.
+(function () {
+    var url = document.currentScript.dataset.url;
+    var DELAY = 150;
+
+    function setup(input) {
+        var field = input.dataset.autocomplete;
+        var list = document.getElementById(input.getAttribute('list'));
+        var timer = null;
+        var pending = null;
+
+        function suggest() {
+            var value = input.value;
+            var head = '';
+            var prefix = value;
+            if (field === 'ingredients') {
+                var comma = value.lastIndexOf(',');
+                head = value.slice(0, comma + 1);
+                prefix = value.slice(comma + 1);
+                if (head) {
+                    head = head.replace(/\s*$/, ' ');
+                }
+            }
+            if (!prefix.trim()) {
+                list.replaceChildren();
+                return;
+            }
+            if (pending) {
+                pending.abort();
+            }
+            pending = new AbortController();
+            // Only the prefix goes in the URL, so the browser cache is shared
+            // by every list ending in the same ingredient
+            var query = new URLSearchParams({field: field, q: prefix.trim().toLowerCase()});
+            fetch(url + '?' + query, {signal: pending.signal, credentials: 'same-origin'})
+                .then(function (response) { return response.ok ? response.json() : {results: []}; })
+                .then(function (data) {
+                    list.replaceChildren.apply(list, data.results.map(function (term) {
+                        var option = document.createElement('option');
+                        option.value = head + term;
+                        return option;
+                    }));
+                })
+                .catch(function () {});
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(suggest, DELAY);
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('input[data-autocomplete]').forEach(setup);
+    });
+})();
@@ -0,0 +1,59 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Recipe, RecipeStats
+
+
+def count_recipes():
+    """Count the recipes per (difficulty, cooking_time) with one GROUP BY over the table."""
+    rows = Recipe.objects.order_by().values('difficulty', 'cooking_time').annotate(count=Count('id'))
+    return Counter({(row['difficulty'], row['cooking_time']): row['count'] for row in rows})
+
+
+def stored_counts():
+    return Counter({
+        (difficulty, cooking_time): count
+        for difficulty, cooking_time, count in RecipeStats.objects.values_list('difficulty', 'cooking_time', 'count')
+        if count
+    })
+
+
+def adjust_recipe_stats(changes):
+    """Add {(difficulty, cooking_time): delta} to the stored counts."""
+    for (difficulty, cooking_time), delta in changes.items():
+        if not delta:
+            continue
+        rows = RecipeStats.objects.filter(difficulty=difficulty, cooking_time=cooking_time)
+        if rows.update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                RecipeStats.objects.create(difficulty=difficulty, cooking_time=cooking_time, count=delta)
+        except IntegrityError:
+            # Another process created the row first
+            rows.update(count=F('count') + delta)
+
+
+def stats_differences():
+    """Return {(difficulty, cooking_time): (stored, actual)} for every count that is wrong."""
+    stored, actual = stored_counts(), count_recipes()
+    return {key: (stored[key], actual[key]) for key in stored.keys() | actual.keys() if stored[key] != actual[key]}
+
+
+def rebuild_recipe_stats():
+    """Replace the stored counts with a fresh count of the recipe table."""
+    counts = count_recipes()
+    with transaction.atomic():
+        RecipeStats.objects.all().delete()
+        RecipeStats.objects.bulk_create(
+            RecipeStats(difficulty=difficulty, cooking_time=cooking_time, count=count)
+            for (difficulty, cooking_time), count in counts.items()
+        )
+    return counts
+
+
+def stats_rows():
+    """The stored counts as rows like views.stats_rows() returns, before bucketing."""
+    return RecipeStats.objects.filter(count__gt=0).values('difficulty', 'cooking_time', 'count')
@@ -0,0 +1,170 @@
+"""Pure-Python SVG versions of the charts in recipes.charts.
+
+The charts only ever show a handful of aggregated counts, so writing the
+SVG markup directly is a few milliseconds and needs neither matplotlib nor
+a worker process. Layout, colours and labels follow the matplotlib charts.
+"""
+import math
+from xml.sax.saxutils import escape
+
+FONT = 'DejaVu Sans, Arial, Helvetica, sans-serif'
+PIE_COLORS = ['#ff6b35', '#e85a14', '#ff9f80', '#cc4400']
+BAR_COLORS = ['#90EE90', '#FFD700', '#FF6347']
+LINE_COLOR = '#ff6b35'
+
+
+def most_common(counts):
+    # Largest first, as in recipes.charts, which can't be imported without matplotlib
+    return sorted(counts.items(), key=lambda item: item[1], reverse=True)
+
+
+def number(value):
+    # Short coordinates keep the markup small
+    return f'{value:.1f}'.rstrip('0').rstrip('.')
+
+
+def text(x, y, content, size=12, anchor='middle', weight=None, transform=None):
+    attributes = f'x="{number(x)}" y="{number(y)}" font-size="{size}" text-anchor="{anchor}"'
+    if weight:
+        attributes += f' font-weight="{weight}"'
+    if transform:
+        attributes += f' transform="{transform}"'
+    return f'<text {attributes}>{escape(str(content))}</text>'
+
+
+def document(width, height, title, elements):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="{FONT}">'
+        f'<title>{escape(title)}</title>'
+        f'<rect width="{width}" height="{height}" fill="#fff"/>'
+        + text(width / 2, 36, title, size=20, weight='bold')
+        + ''.join(elements)
+        + '</svg>'
+    ).encode()
+
+
+def nice_ticks(maximum, count=5):
+    """Round axis ticks from 0 to at least `maximum`, e.g. 0, 20, 40 ... 120."""
+    if maximum <= 0:
+        return [0, 1]
+    raw = maximum / count
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(factor * magnitude for factor in (1, 2, 2.5, 5, 10) if factor * magnitude >= raw)
+    if step < 1:
+        # Counts are whole numbers
+        step = 1
+    return [i * step for i in range(math.ceil(maximum / step) + 1)]
+
+
+def value_axis(ticks, left, right, top, bottom, label):
+    # Horizontal grid lines with their values, and the rotated axis label
+    elements = []
+    for tick in ticks:
+        y = bottom - (bottom - top) * tick / ticks[-1]
+        elements.append(
+            f'<line x1="{number(left)}" y1="{number(y)}" x2="{number(right)}" y2="{number(y)}" '
+            f'stroke="#b0b0b0" stroke-opacity="0.3"/>'
+        )
+        elements.append(text(left - 8, y + 4, f'{tick:g}', anchor='end'))
+    middle = (top + bottom) / 2
+    elements.append(text(left - 56, middle, label, size=14, transform=f'rotate(-90 {number(left - 56)} {number(middle)})'))
+    elements.append(
+        f'<path d="M{number(left)} {number(top)}V{number(bottom)}H{number(right)}" fill="none" stroke="#000"/>'
+    )
+    return elements
+
+
+def create_cooking_time_pie_chart(stats):
+    width, height = 800, 640
+    cx, cy, radius = width / 2, height / 2 + 24, 230
+    slices = most_common(stats['time_category'])
+    total = sum(count for _, count in slices)
+
+    elements = []
+    # Counterclockwise from 12 o'clock, like matplotlib's startangle=90
+    angle = 90.0
+    for i, (label, count) in enumerate(slices):
+        sweep = 360.0 * count / total
+        color = PIE_COLORS[i % len(PIE_COLORS)]
+        if sweep >= 360:
+            elements.append(f'<circle cx="{number(cx)}" cy="{number(cy)}" r="{radius}" fill="{color}"/>')
+        elif sweep > 0:
+            start, end = math.radians(angle), math.radians(angle + sweep)
+            elements.append(
+                f'<path d="M{number(cx)} {number(cy)}'
+                f'L{number(cx + radius * math.cos(start))} {number(cy - radius * math.sin(start))}'
+                f'A{radius} {radius} 0 {int(sweep > 180)} 0 '
+                f'{number(cx + radius * math.cos(end))} {number(cy - radius * math.sin(end))}Z" fill="{color}"/>'
+            )
+        middle = math.radians(angle + sweep / 2)
+        cos, sin = math.cos(middle), math.sin(middle)
+        anchor = 'start' if cos > 0.1 else 'end' if cos < -0.1 else 'middle'
+        elements.append(text(cx + radius * 1.1 * cos, cy - radius * 1.1 * sin + 5, label, size=14, anchor=anchor))
+        elements.append(text(cx + radius * 0.6 * cos, cy - radius * 0.6 * sin + 5, f'{100 * count / total:.1f}%', size=14))
+        angle += sweep
+    return document(width, height, 'Recipe Distribution by Cooking Time', elements)
+
+
+def create_difficulty_bar_chart(stats):
+    width, height = 800, 480
+    left, right, top, bottom = 100, width - 30, 70, height - 70
+    bars = most_common(stats['difficulty'])
+    ticks = nice_ticks(max(count for _, count in bars))
+
+    elements = value_axis(ticks, left, right, top, bottom, 'Number of Recipes')
+    slot = (right - left) / len(bars)
+    for i, (label, count) in enumerate(bars):
+        bar_height = (bottom - top) * count / ticks[-1]
+        x = left + slot * i + slot * 0.1
+        elements.append(
+            f'<rect x="{number(x)}" y="{number(bottom - bar_height)}" width="{number(slot * 0.8)}" '
+            f'height="{number(bar_height)}" fill="{BAR_COLORS[i % len(BAR_COLORS)]}"/>'
+        )
+        center = left + slot * (i + 0.5)
+        # Value label on the bar, and the category below the axis
+        elements.append(text(center, bottom - bar_height - 6, count))
+        elements.append(text(center, bottom + 20, label or '(none)'))
+    elements.append(text((left + right) / 2, height - 20, 'Difficulty Level', size=14))
+    return document(width, height, 'Recipe Distribution by Difficulty Level', elements)
+
+
+def create_cooking_time_line_chart(stats):
+    width, height = 960, 480
+    left, right, top, bottom = 100, width - 30, 70, height - 110
+    last_range = max(stats['time_range'], default=-1)
+    counts = [stats['time_range'].get(i, 0) for i in range(last_range + 1)]
+    labels = [f'{i * 10}-{i * 10 + 9}' for i in range(last_range + 1)]
+    ticks = nice_ticks(max(counts, default=0))
+
+    elements = value_axis(ticks, left, right, top, bottom, 'Number of Recipes')
+    step = (right - left) / max(len(counts), 1)
+    points = [
+        (left + step * (i + 0.5), bottom - (bottom - top) * count / ticks[-1])
+        for i, count in enumerate(counts)
+    ]
+    if points:
+        line = ' '.join(f'{number(x)},{number(y)}' for x, y in points)
+        area = f'{number(points[0][0])},{bottom} {line} {number(points[-1][0])},{bottom}'
+        elements.append(f'<polygon points="{area}" fill="{LINE_COLOR}" fill-opacity="0.3"/>')
+        elements.append(f'<polyline points="{line}" fill="none" stroke="{LINE_COLOR}" stroke-width="2"/>')
+        elements.extend(f'<circle cx="{number(x)}" cy="{number(y)}" r="4" fill="{LINE_COLOR}"/>' for x, y in points)
+    for (x, _), label in zip(points, labels):
+        # Rotated range labels, like labelrotation=45
+        elements.append(text(x, bottom + 16, label, size=11, anchor='end',
+                             transform=f'rotate(-45 {number(x)} {number(bottom + 16)})'))
+    elements.append(text((left + right) / 2, height - 16, 'Cooking Time Range (minutes)', size=14))
+    return document(width, height, 'Recipe Count by Cooking Time Range', elements)
+
+
+CHART_RENDERERS = {
+    'pie': create_cooking_time_pie_chart,
+    'bar': create_difficulty_bar_chart,
+    'line': create_cooking_time_line_chart,
+}
+
+
+def render(kind, stats, fmt='svg'):
+    if fmt != 'svg':
+        raise ValueError(f'The SVG chart backend cannot render {fmt}')
+    return CHART_RENDERERS[kind](stats)
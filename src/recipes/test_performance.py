@@ -0,0 +1,204 @@
+"""Performance regression tests for the search and chart paths.
+
+By default only a 1k recipe table is seeded and only query counts are
+asserted. Environment variables widen the run:
+
+    RECIPES_PERF_SIZES=1000,10000,100000   table sizes to seed
+    RECIPES_PERF_RUNS=20                   timed requests per case
+    RECIPES_PERF_BUDGETS=1                 also fail on p95 latency budgets and
+                                           the startup import budget (see tests)
+    RECIPES_PERF_OUTPUT=perf.json          write the timings as JSON
+
+e.g. RECIPES_PERF_OUTPUT=perf.json python manage.py test recipes.test_performance
+"""
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import get_chart_cache, get_page_cache
+from .models import Recipe, bulk_sync_ingredients, calculate_difficulties, count_ingredients
+from .stats import rebuild_recipe_stats
+from .views import generate_charts
+
+SIZES = [int(size) for size in os.environ.get('RECIPES_PERF_SIZES', '1000').split(',')]
+RUNS = int(os.environ.get('RECIPES_PERF_RUNS', '10'))
+ENFORCE_BUDGETS = os.environ.get('RECIPES_PERF_BUDGETS') == '1'
+OUTPUT = os.environ.get('RECIPES_PERF_OUTPUT')
+
+# Search form filter combinations exercised against the list view
+FILTERS = {
+    'unfiltered': {},
+    'name': {'recipe_name': 'recipe 42'},
+    'ingredients_any': {'ingredients': 'ingredient 7, ingredient 11'},
+    'ingredients_all': {'ingredients': 'ingredient 7, ingredient 11', 'ingredient_match': 'all'},
+    'time_range': {'cooking_time_min': 20, 'cooking_time_max': 45},
+    'difficulty': {'difficulty': 'Easy'},
+    'combined': {'ingredients': 'ingredient 3', 'cooking_time_max': 60, 'difficulty': 'Medium'},
+    'deep_page': {'page': 40},
+    'cursor': {'cursor': '120_0'},
+}
+
+# The stats aggregate and one page of recipes; the session and user are
+# served from their caches after the warm-up request
+MAX_LIST_QUERIES = 2
+# Just the stats aggregate
+MAX_CHART_QUERIES = 1
+
+# p95 budgets in seconds by table size, for cold (uncached) requests
+LIST_BUDGETS = {1000: 0.25, 10000: 0.3, 100000: 0.6}
+CHART_BUDGETS = {1000: 0.4, 10000: 0.5, 100000: 0.75}
+
+RESULTS = []
+
+
+def percentile(timings, percent):
+    timings = sorted(timings)
+    return timings[max(0, round(percent / 100 * len(timings)) - 1)]
+
+
+def budget(budgets, size):
+    # The budget of the nearest configured size at or above this one
+    return next((budgets[limit] for limit in sorted(budgets) if size <= limit), max(budgets.values()))
+
+
+def seed(size):
+    rng = random.Random(size)
+    ingredients = [f'ingredient {i}' for i in range(200)]
+    for start in range(0, size, 1000):
+        recipes = []
+        for i in range(start, min(start + 1000, size)):
+            text = ', '.join(rng.sample(ingredients, rng.randint(1, 12)))
+            recipes.append(Recipe(
+                name=f'Synthetic recipe {i}',
+                ingredients=text,
+                ingredient_count=count_ingredients(text),
+                cooking_time=rng.randint(1, 240),
+            ))
+        difficulties = calculate_difficulties(
+            [recipe.cooking_time for recipe in recipes],
+            [recipe.ingredient_count for recipe in recipes],
+        )
+        for recipe, difficulty in zip(recipes, difficulties):
+            recipe.difficulty = difficulty
+        # Same bulk path as import_recipes
+        Recipe.objects.bulk_create(recipes)
+        bulk_sync_ingredients(recipes)
+    rebuild_recipe_stats()
+
+
+def tearDownModule():
+    if not OUTPUT or not RESULTS:
+        return
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=Path(__file__).parent,
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    Path(OUTPUT).write_text(json.dumps({
+        'commit': commit,
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        'runs': RUNS,
+        'results': RESULTS,
+    }, indent=2))
+
+
+class RecipePerformanceMixin:
+    """Query counts and latency of the list view and charts for a seeded table of `size` recipes"""
+
+    size = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        """Seed the synthetic recipes once for the class"""
+        seed(cls.size)
+        cls.user = User.objects.create_user(username='perf', password='perfpass123')
+
+    def setUp(self):
+        """Log in"""
+        self.client.force_login(self.user)
+
+    def measure(self, case, url, data=None, max_queries=None, budgets=None):
+        # One untimed request first, so imports, font loading and the session
+        # and user lookups aren't counted
+        self.client.get(url, data)
+        timings = []
+        for _ in range(RUNS):
+            # Measure the uncached path: nothing from an earlier run is reused
+            get_chart_cache().clear()
+            get_page_cache().clear()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = self.client.get(url, data)
+                timings.append(time.perf_counter() - start)
+            self.assertEqual(response.status_code, 200)
+        self.record(case, timings, len(queries))
+        if max_queries is not None:
+            self.assertLessEqual(len(queries), max_queries, f'{case} ran {len(queries)} queries')
+        self.check_budget(case, timings, budgets)
+
+    def record(self, case, timings, queries=None):
+        RESULTS.append({
+            'size': self.size,
+            'case': case,
+            'queries': queries,
+            'p50_ms': round(percentile(timings, 50) * 1000, 2),
+            'p95_ms': round(percentile(timings, 95) * 1000, 2),
+        })
+
+    def check_budget(self, case, timings, budgets):
+        if ENFORCE_BUDGETS and budgets:
+            limit = budget(budgets, self.size)
+            self.assertLessEqual(percentile(timings, 95), limit, f'{case} p95 over {limit * 1000:.0f} ms')
+
+    def test_list_filters(self):
+        """Test the list view's query count and latency for each filter combination"""
+        for name, data in FILTERS.items():
+            with self.subTest(filters=name):
+                self.measure(
+                    f'list:{name}', reverse('recipes:recipes_list'), data,
+                    max_queries=MAX_LIST_QUERIES, budgets=LIST_BUDGETS,
+                )
+
+    @override_settings(RECIPES_CHART_WORKERS=0)
+    def test_chart_endpoint(self):
+        """Test the chart endpoint's query count and latency with real rendering"""
+        for kind in ('pie', 'bar', 'line'):
+            with self.subTest(kind=kind):
+                self.measure(
+                    f'chart:{kind}', reverse('recipes:recipes_chart', args=[kind, 'png']), {'difficulty': 'Easy'},
+                    max_queries=MAX_CHART_QUERIES, budgets=CHART_BUDGETS,
+                )
+
+    @override_settings(RECIPES_CHART_WORKERS=0)
+    def test_generate_charts(self):
+        """Benchmark computing the statistics and rendering all three charts"""
+        generate_charts(Recipe.objects.all())
+        timings = []
+        for _ in range(max(1, RUNS // 2)):
+            start = time.perf_counter()
+            charts = generate_charts(Recipe.objects.all())
+            timings.append(time.perf_counter() - start)
+        self.assertEqual(set(charts), {'pie_chart', 'bar_chart', 'line_chart'})
+        self.record('generate_charts', timings)
+        self.check_budget('generate_charts', timings, {size: limit * 3 for size, limit in CHART_BUDGETS.items()})
+
+
+# One test case per configured table size
+for _size in SIZES:
+    _name = f'RecipePerformance{_size}Test'
+    globals()[_name] = type(_name, (RecipePerformanceMixin, TestCase), {'size': _size})
+del _size, _name
@@ -1,13 +1,53 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, RequestFactory
 from django.core.exceptions import ValidationError
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import OperationalError, connection, connections
 from django.db.models import QuerySet
-from unittest.mock import patch, MagicMock
-import pandas as pd
-from .models import Recipe
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils.functional import empty
+from django.utils.http import parse_http_date
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from unittest import skipUnless
+from unittest.mock import patch, MagicMock, PropertyMock
+from asgiref.sync import async_to_sync
+from io import BytesIO, StringIO
+from PIL import Image
+from pathlib import Path
+import shutil
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from xml.etree import ElementTree
+from collections import Counter
+from contextlib import contextmanager
+from .models import Ingredient, Recipe, RecipeSimilarity, calculate_difficulties, calculate_difficulty, split_ingredients
 from .forms import RecipeSearchForm
-from .views import generate_charts, create_cooking_time_pie_chart, create_difficulty_bar_chart, create_cooking_time_line_chart
+from .views import asummary_stats, astats_for, filter_recipes, generate_charts, recipe_stats
+from .stats import stats_differences, stored_counts
+from .similarity import rebuild_similar_recipes, similarity_scores
+from .charts import create_cooking_time_pie_chart, create_difficulty_bar_chart, create_cooking_time_line_chart
+from . import autocomplete, chart_pool, svg_charts
+from recipe_project.backends import get_user_cache, user_cache_key
+from recipe_project.files import accepted_encodings
+from recipe_project.middleware import histograms
+from .search import search_recipes
+from .cache import (
+    get_chart_cache, get_data_version, get_page_cache, normalize_filters, chart_cache_key, detail_cache_key,
+    detail_page_version, invalidate_recipes,
+)
 
 class RecipeModelTest(TestCase):
     def setUp(self):
@@ -25,6 +65,62 @@ class RecipeModelTest(TestCase):
         self.assertEqual(self.recipe.cooking_time, 30)
         self.assertEqual(self.recipe.ingredients, "flour, eggs, milk")
     
+    def test_ingredients_normalized(self):
+        """Test that ingredients are split into normalized Ingredient rows"""
+        self.assertEqual(split_ingredients(" Flour,eggs ,, FLOUR,  brown   sugar "), ['flour', 'eggs', 'brown sugar'])
+        self.assertEqual(
+            sorted(self.recipe.ingredient_list.values_list('name', flat=True)),
+            ['eggs', 'flour', 'milk']
+        )
+
+    def test_ingredients_resynced_on_change(self):
+        """Test that editing the ingredient text updates the relation"""
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.ingredients = "flour, butter"
+        recipe.save()
+        self.assertEqual(
+            sorted(recipe.ingredient_list.values_list('name', flat=True)),
+            ['butter', 'flour']
+        )
+        # Ingredients are shared between recipes rather than duplicated
+        Recipe.objects.create(name="Shortbread", cooking_time=20, ingredients="butter, flour, sugar")
+        self.assertEqual(Ingredient.objects.filter(name='flour').count(), 1)
+
+    def test_ingredient_count_maintained(self):
+        """Test that the stored ingredient count follows the ingredient text"""
+        self.assertEqual(self.recipe.ingredient_count, 3)
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.ingredients = "flour, , butter"
+        recipe.save()
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).ingredient_count, 2)
+
+    def test_calculated_difficulty_follows_changes(self):
+        """Test that a calculated difficulty is recalculated when its inputs change"""
+        recipe = Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread")
+        self.assertEqual(recipe.difficulty, 'Easy')
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.ingredients = "bread, butter, jam, honey, cinnamon, sugar"
+        recipe.save()
+        self.assertEqual(recipe.difficulty, 'Medium')
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.cooking_time = 90
+        recipe.save()
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).difficulty, 'Hard')
+
+    def test_chosen_difficulty_kept(self):
+        """Test that a difficulty set by hand is not overwritten"""
+        recipe = Recipe.objects.create(name="Souffle", cooking_time=20, ingredients="eggs", difficulty='Hard')
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.ingredients = "eggs, cheese"
+        recipe.save()
+        self.assertEqual(recipe.difficulty, 'Hard')
+        # Also when it is changed in the same save as the ingredients
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.ingredients = "flour"
+        recipe.difficulty = 'Hard'
+        recipe.save()
+        self.assertEqual(recipe.difficulty, 'Hard')
+
     def test_recipe_str_method(self):
         """Test the string representation of recipe"""
         self.assertEqual(str(self.recipe), "Test Recipe")
@@ -71,6 +167,70 @@ class RecipeModelTest(TestCase):
     
 
 
+class RecipeThumbnailTest(TestCase):
+    """Test thumbnail generation for recipe pictures"""
+
+    def setUp(self):
+        """Point media storage at a temporary directory"""
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, RECIPES_THUMBNAIL_FORMAT='WEBP')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, name, size=(1000, 500)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'orange').save(buffer, format='JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def test_thumbnails_generated_on_upload(self):
+        """Test that uploading a picture writes resized WebP variants"""
+        recipe = Recipe.objects.create(name="Chili", cooking_time=60, ingredients="beans", pic=self.upload('chili.jpg'))
+        self.assertEqual(
+            recipe.thumbnail_srcset,
+            '/media/recipes/thumbs/chili.jpg_320.webp 320w, /media/recipes/thumbs/chili.jpg_640.webp 640w'
+        )
+        self.assertEqual(recipe.thumbnail_url, '/media/recipes/thumbs/chili.jpg_320.webp')
+        with Image.open(f'{self.media_root}/recipes/thumbs/chili.jpg_640.webp') as thumbnail:
+            self.assertEqual(thumbnail.format, 'WEBP')
+            self.assertEqual(thumbnail.size, (640, 320))
+
+    def test_thumbnails_keep_source_extension(self):
+        """Test that pictures differing only by extension get their own thumbnails"""
+        jpg = Recipe.objects.create(name="Chili", cooking_time=60, ingredients="beans", pic=self.upload('chili.jpg'))
+        png = Recipe.objects.create(name="Chili 2", cooking_time=60, ingredients="beans", pic=self.upload('chili.png', (800, 400)))
+        self.assertEqual(jpg.thumbnail_url, '/media/recipes/thumbs/chili.jpg_320.webp')
+        self.assertEqual(png.thumbnail_url, '/media/recipes/thumbs/chili.png_320.webp')
+        with Image.open(f'{self.media_root}/recipes/thumbs/chili.jpg_640.webp') as thumbnail:
+            self.assertEqual(thumbnail.size, (640, 320))
+
+    def test_new_picture_replaces_stale_thumbnails(self):
+        """Test that a picture saved under an old name gets fresh thumbnails"""
+        recipe = Recipe.objects.create(name="Chili", cooking_time=60, ingredients="beans", pic=self.upload('chili.jpg'))
+        recipe.pic.delete(save=False)
+        recipe.pic = self.upload('chili.jpg', (1000, 1000))
+        recipe.save()
+        self.assertEqual(recipe.pic.name, 'recipes/chili.jpg')
+        with Image.open(f'{self.media_root}/recipes/thumbs/chili.jpg_640.webp') as thumbnail:
+            self.assertEqual(thumbnail.size, (640, 640))
+
+    def test_small_pictures_not_upscaled(self):
+        """Test that pictures narrower than a thumbnail are served as is"""
+        recipe = Recipe.objects.create(name="Dip", cooking_time=5, ingredients="avocado", pic=self.upload('dip.jpg', (400, 300)))
+        self.assertEqual(recipe.thumbnail_srcset, '/media/recipes/thumbs/dip.jpg_320.webp 320w')
+        tiny = Recipe.objects.create(name="Salt", cooking_time=1, ingredients="salt", pic=self.upload('salt.jpg', (100, 100)))
+        self.assertEqual(tiny.thumbnail_srcset, '')
+        self.assertEqual(tiny.thumbnail_url, tiny.pic.url)
+
+    def test_command_builds_missing_thumbnails(self):
+        """Test the management command covers existing and default pictures"""
+        shutil.copy(Path(__file__).resolve().parent.parent / 'media' / 'no_picture.jpeg', self.media_root)
+        recipe = Recipe.objects.create(name="Plain", cooking_time=5, ingredients="water")
+        self.assertEqual(recipe.thumbnail_srcset, '')
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertEqual(recipe.thumbnail_url, '/media/thumbs/no_picture.jpeg_320.webp')
+
+
 class RecipeSearchFormTest(TestCase):
     """Test the RecipeSearchForm functionality"""
     
@@ -202,6 +362,23 @@ class RecipeSearchViewTest(TestCase):
         self.assertContains(response, self.recipe1.name)
         self.assertNotContains(response, self.recipe2.name)
     
+    def test_search_by_name_prefix(self):
+        """Test that name search matches word prefixes and ranks the best match first"""
+        pasta_bake = Recipe.objects.create(name="Pasta Pasta Bake", cooking_time=40, ingredients="pasta")
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('recipes:recipes_list'), {'recipe_name': 'pas'})
+        self.assertEqual(list(response.context['recipes']), [pasta_bake, self.recipe1])
+        self.assertEqual(response.context['total_results'], 2)
+
+    def test_search_index_follows_updates(self):
+        """Test that renamed and deleted recipes are reindexed"""
+        self.recipe2.name = "Slow Roast Lamb"
+        self.recipe2.save()
+        self.assertTrue(search_recipes(Recipe.objects.all(), 'lamb').exists())
+        self.assertFalse(search_recipes(Recipe.objects.all(), 'beef').exists())
+        self.recipe2.delete()
+        self.assertFalse(search_recipes(Recipe.objects.all(), 'lamb').exists())
+
     def test_search_by_ingredients(self):
         """Test searching by ingredients"""
         self.client.login(username='testuser', password='testpass123')
@@ -222,6 +399,26 @@ class RecipeSearchViewTest(TestCase):
         self.assertContains(response, self.recipe1.name)  # Has both
         self.assertContains(response, self.recipe3.name)  # Has tomato
     
+    def test_search_does_not_match_substrings(self):
+        """Test that ingredient search matches whole ingredient names"""
+        eggplant = Recipe.objects.create(name="Eggplant Parm", cooking_time=50, ingredients="eggplant, cheese")
+        omelette = Recipe.objects.create(name="Omelette", cooking_time=10, ingredients="Egg, milk")
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('recipes:recipes_list'), {'ingredients': 'egg'})
+        self.assertContains(response, omelette.name)
+        self.assertNotContains(response, eggplant.name)
+
+    def test_search_all_ingredients(self):
+        """Test "all of" ingredient search requires every ingredient"""
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('recipes:recipes_list'), {
+            'ingredients': 'tomato, mozzarella',
+            'ingredient_match': 'all'
+        })
+        self.assertContains(response, self.recipe3.name)
+        self.assertNotContains(response, self.recipe1.name)
+        self.assertEqual(response.context['total_results'], 1)
+
     def test_search_by_cooking_time_range(self):
         """Test searching by cooking time range"""
         self.client.login(username='testuser', password='testpass123')
@@ -294,6 +491,126 @@ class RecipeSearchViewTest(TestCase):
         self.assertContains(response, expected_url2)
 
 
+@override_settings(RECIPES_PAGE_SIZE=2)
+class RecipePaginationTest(TestCase):
+    """Test pagination of the recipe list"""
+
+    def setUp(self):
+        """Set up a user and five recipes"""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.login(username='testuser', password='testpass123')
+        self.recipes = [
+            Recipe.objects.create(name=f"Soup {i}", cooking_time=time, ingredients="water, salt")
+            for i, time in enumerate([40, 10, 20, 20, 90])
+        ]
+
+    def test_page_numbers(self):
+        """Test page-number pagination keeps the total and search parameters"""
+        url = reverse('recipes:recipes_list')
+        response = self.client.get(url, {'ingredients': 'salt', 'page': 2})
+        self.assertEqual(response.context['total_results'], 5)
+        self.assertEqual([r.cooking_time for r in response.context['recipes']], [20, 40])
+        self.assertEqual(response.context['pagination_query'], 'ingredients=salt')
+        self.assertContains(response, '?ingredients=salt&page=3')
+
+    def test_invalid_page_falls_back(self):
+        """Test out of range page numbers show the last page"""
+        response = self.client.get(reverse('recipes:recipes_list'), {'page': 99})
+        self.assertEqual(response.context['page_obj'].number, 3)
+
+    def test_keyset_cursor(self):
+        """Test cursor pagination walks every recipe once in order"""
+        url = reverse('recipes:recipes_list')
+        seen = []
+        params = {'cursor': ''}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.context['total_results'], 5)
+            seen.extend(recipe.id for recipe in response.context['recipes'])
+            if not response.context['next_cursor']:
+                break
+            params = {'cursor': response.context['next_cursor']}
+        expected = [r.id for r in sorted(self.recipes, key=lambda r: (r.cooking_time, r.id))]
+        self.assertEqual(seen, expected)
+
+    @override_settings(RECIPES_PAGINATION='keyset')
+    def test_keyset_setting(self):
+        """Test the keyset setting paginates without a cursor parameter"""
+        response = self.client.get(reverse('recipes:recipes_list'))
+        self.assertIsNone(response.context['page_obj'])
+        self.assertEqual(len(response.context['recipes']), 2)
+        self.assertContains(response, 'cursor=' + response.context['next_cursor'])
+
+
+class RecipeApiTest(TestCase):
+    """Test the JSON search API"""
+
+    def setUp(self):
+        """Set up a user and recipes"""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.login(username='testuser', password='testpass123')
+        self.pasta = Recipe.objects.create(name="Quick Pasta", cooking_time=15, ingredients="pasta, cheese")
+        self.beef = Recipe.objects.create(name="Slow Roast Beef", cooking_time=180, ingredients="beef, potatoes")
+        self.pizza = Recipe.objects.create(name="Medium Pizza", cooking_time=45, ingredients="flour, cheese")
+
+    def test_filters_and_default_fields(self):
+        """Test that the API applies the search form filters"""
+        response = self.client.get(reverse('recipes:recipes_api'), {'ingredients': 'cheese'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total_results'], 2)
+        self.assertEqual(data['results'], [
+            {'id': self.pasta.id, 'name': 'Quick Pasta', 'cooking_time': 15, 'difficulty': 'Easy'},
+            {'id': self.pizza.id, 'name': 'Medium Pizza', 'cooking_time': 45, 'difficulty': 'Medium'},
+        ])
+
+    def test_field_projection(self):
+        """Test that fields= limits both the output and the loaded columns"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('recipes:recipes_api'), {'fields': 'name,pic'})
+        self.assertEqual(response.json()['results'][0], {'name': 'Quick Pasta', 'pic': '/media/no_picture.jpeg'})
+        page_query = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"ingredients"', page_query)
+
+    def test_invalid_parameters(self):
+        """Test that unknown fields and invalid filters are rejected"""
+        response = self.client.get(reverse('recipes:recipes_api'), {'fields': 'name,secret'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('recipes:recipes_api'), {'cooking_time_min': -1})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        """Test that next_cursor walks the results"""
+        url = reverse('recipes:recipes_api')
+        first = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual([r['id'] for r in first['results']], [self.pasta.id, self.pizza.id])
+        second = self.client.get(url, {'limit': 2, 'cursor': first['next_cursor']}).json()
+        self.assertEqual([r['id'] for r in second['results']], [self.beef.id])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_conditional_get(self):
+        """Test that polling with the ETag returns 304 until the data changes"""
+        url = reverse('recipes:recipes_api')
+        etag = self.client.get(url)['ETag']
+        # The session and user are cached too, so revalidating needs no queries
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.pasta.cooking_time = 20
+        self.pasta.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(RECIPES_CHART_WORKERS=0)
 class RecipeChartsTest(TestCase):
     """Test the chart generation functionality"""
     
@@ -322,15 +639,15 @@ class RecipeChartsTest(TestCase):
             )
         ]
     
-    @patch('recipes.views.plt')
-    @patch('recipes.views.base64')
-    @patch('recipes.views.BytesIO')
-    def test_generate_charts_with_data(self, mock_bytesio, mock_base64, mock_plt):
+    @override_settings(RECIPES_CHART_BACKEND='matplotlib')
+    @patch('recipes.charts.Figure')
+    @patch('recipes.charts.BytesIO')
+    def test_generate_charts_with_data(self, mock_bytesio, mock_figure):
         """Test chart generation with valid data"""
         # Mock the plotting and encoding process
         mock_buffer = MagicMock()
         mock_bytesio.return_value = mock_buffer
-        mock_base64.b64encode.return_value.decode.return_value = 'test_chart_data'
+        mock_buffer.getvalue.return_value = b'test_chart_data'
         
         queryset = Recipe.objects.all()
         charts = generate_charts(queryset)
@@ -341,9 +658,9 @@ class RecipeChartsTest(TestCase):
         self.assertIn('line_chart', charts)
         
         # Verify each chart has data
-        self.assertEqual(charts['pie_chart'], 'test_chart_data')
-        self.assertEqual(charts['bar_chart'], 'test_chart_data')
-        self.assertEqual(charts['line_chart'], 'test_chart_data')
+        self.assertEqual(charts['pie_chart'], b'test_chart_data')
+        self.assertEqual(charts['bar_chart'], b'test_chart_data')
+        self.assertEqual(charts['line_chart'], b'test_chart_data')
     
     def test_generate_charts_empty_queryset(self):
         """Test chart generation with empty queryset"""
@@ -353,31 +670,1336 @@ class RecipeChartsTest(TestCase):
         # Should return empty dict for no data
         self.assertEqual(charts, {})
     
-    @patch('recipes.views.plt')
-    def test_cooking_time_categorization(self, mock_plt):
+    @patch('recipes.charts.Figure')
+    def test_cooking_time_categorization(self, mock_figure):
         """Test cooking time categorization for pie chart"""
-        # Create DataFrame with test data
-        test_data = [
-            {'cooking_time': 10, 'difficulty': 'Easy'},
-            {'cooking_time': 25, 'difficulty': 'Medium'},
-            {'cooking_time': 45, 'difficulty': 'Medium'},
-            {'cooking_time': 120, 'difficulty': 'Hard'}
-        ]
-        df = pd.DataFrame(test_data)
+        # Aggregate the chart statistics from the test recipes
+        stats = recipe_stats(Recipe.objects.all())
+        self.assertEqual(stats['time_category'], {
+            'Quick (≤15 min)': 2,
+            'Medium (16-30 min)': 1,
+            'Very Long (>60 min)': 1,
+        })
         
         # Mock the plotting to prevent actual chart generation
-        mock_plt.figure.return_value = MagicMock()
-        mock_plt.pie.return_value = MagicMock()
-        mock_plt.savefig.return_value = MagicMock()
-        mock_plt.close.return_value = MagicMock()
+        mock_figure.return_value = MagicMock()
         
         # This would normally create a chart, but we're testing the logic
-        with patch('recipes.views.BytesIO'), patch('recipes.views.base64'):
+        with patch('recipes.charts.BytesIO'):
             try:
-                create_cooking_time_pie_chart(df)
+                create_cooking_time_pie_chart(stats)
                 chart_created = True
             except Exception:
                 chart_created = False
         
         # Chart creation function should not raise exceptions
-        self.assertTrue(chart_created)
\ No newline at end of file
+        self.assertTrue(chart_created)
+
+    def test_charts_render_without_pyplot(self):
+        """Test that each chart renders real images through the Figure API"""
+        stats = recipe_stats(Recipe.objects.all())
+        for render in (create_cooking_time_pie_chart, create_difficulty_bar_chart, create_cooking_time_line_chart):
+            self.assertTrue(render(stats).startswith(b'\x89PNG'))
+        self.assertNotIn('matplotlib.pyplot', sys.modules)
+
+    def test_recipe_stats_single_query(self):
+        """Test that all chart statistics come from one query"""
+        Recipe.objects.create(name="Negative", cooking_time=-5, difficulty="Easy")
+        with self.assertNumQueries(1):
+            stats = recipe_stats(Recipe.objects.all())
+        self.assertEqual(stats['total'], 5)
+        self.assertEqual(stats['difficulty'], {'Easy': 3, 'Medium': 1, 'Hard': 1})
+        # 10, 15 -> 1; 30 -> 3; 90 -> 9; the negative time is not charted
+        self.assertEqual(stats['time_range'], {1: 2, 3: 1, 9: 1})
+
+    def test_recipes_list_query_count(self):
+        """Test that the list view runs the aggregate and page queries only"""
+        get_chart_cache().clear()
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        # Load the session and user into their caches
+        self.client.get(reverse('recipes:recipes_list'))
+        # Just the aggregate and the page of recipes
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('recipes:recipes_list'), {'difficulty': 'Easy'})
+        self.assertEqual(response.context['total_results'], 2)
+
+
+class RecipeChartCacheTest(TestCase):
+    """Test the chart endpoint and caching of rendered charts"""
+
+    def setUp(self):
+        """Set up test data and an empty chart cache"""
+        get_chart_cache().clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.login(username='testuser', password='testpass123')
+        self.recipe = Recipe.objects.create(
+            name="Quick Pasta",
+            cooking_time=15,
+            ingredients="pasta, tomato sauce, cheese"
+        )
+
+    def test_normalize_filters(self):
+        """Test that equivalent searches normalize to the same filters"""
+        first = {'recipe_name': ' Pasta ', 'ingredients': 'Cheese, tomato', 'difficulty': '', 'cooking_time_min': None}
+        second = {'recipe_name': 'pasta', 'ingredients': 'tomato,cheese,'}
+        self.assertEqual(normalize_filters(first), {'recipe_name': 'pasta', 'ingredients': ['cheese', 'tomato']})
+        self.assertEqual(chart_cache_key(first, 'pie', 'png'), chart_cache_key(second, 'pie', 'png'))
+        self.assertNotEqual(chart_cache_key(first, 'pie', 'png'), chart_cache_key({}, 'pie', 'png'))
+        self.assertNotEqual(chart_cache_key({}, 'pie', 'png'), chart_cache_key({}, 'bar', 'png'))
+
+    def test_list_links_chart_urls(self):
+        """Test that the list page links charts instead of inlining them"""
+        response = self.client.get(reverse('recipes:recipes_list'), {'recipe_name': 'pasta', 'page': '2'})
+        pie_url = reverse('recipes:recipes_chart', args=['pie', 'svg']) + '?recipe_name=pasta'
+        self.assertEqual(response.context['charts']['pie_chart'], pie_url)
+        self.assertNotContains(response, 'data:image/png;base64')
+
+    @override_settings(RECIPES_CHART_BACKEND='matplotlib')
+    def test_matplotlib_backend_links_png(self):
+        """Test that the matplotlib backend links PNG charts"""
+        response = self.client.get(reverse('recipes:recipes_list'), {'recipe_name': 'pasta'})
+        pie_url = reverse('recipes:recipes_chart', args=['pie', 'png']) + '?recipe_name=pasta'
+        self.assertEqual(response.context['charts']['pie_chart'], pie_url)
+
+    # Rendered in the request, so a cold worker pool can't time out the test
+    @override_settings(RECIPES_CHART_WORKERS=0)
+    def test_chart_endpoint_headers(self):
+        """Test that charts are served as images with caching headers"""
+        response = self.client.get(reverse('recipes:recipes_chart', args=['bar', 'png']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        self.assertIn('max-age', response['Cache-Control'])
+
+        # Revalidating with the ETag returns 304 without a body
+        response = self.client.get(reverse('recipes:recipes_chart', args=['bar', 'png']),
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_chart_endpoint_svg(self):
+        """Test that charts can be requested as SVG"""
+        response = self.client.get(reverse('recipes:recipes_chart', args=['line', 'svg']))
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', response.content)
+
+    def test_chart_endpoint_not_found(self):
+        """Test unknown charts and empty results return 404"""
+        response = self.client.get(reverse('recipes:recipes_chart', args=['radar', 'png']))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('recipes:recipes_chart', args=['pie', 'png']), {'recipe_name': 'nothing'})
+        self.assertEqual(response.status_code, 404)
+
+    @patch('recipes.chart_pool.arender_chart', return_value=b'chart')
+    def test_charts_share_list_stats(self, mock_render):
+        """Test that chart requests reuse the statistics computed for the list page"""
+        self.client.get(reverse('recipes:recipes_list'), {'recipe_name': 'pasta'})
+        for kind in ('pie', 'bar', 'line'):
+            # No aggregate query, and the session and user are cached
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse('recipes:recipes_chart', args=[kind, 'png']), {'recipe_name': 'pasta'})
+            self.assertEqual(response.content, b'chart')
+        self.assertEqual(mock_render.call_args.args[1]['total'], 1)
+
+    @patch('recipes.views.render_chart', return_value=b'cached')
+    def test_repeated_search_uses_cache(self, mock_render):
+        """Test that repeating a search does not re-render charts"""
+        url = reverse('recipes:recipes_chart', args=['pie', 'png'])
+        self.client.get(url, {'recipe_name': 'pasta'})
+        response = self.client.get(url, {'recipe_name': 'PASTA '})
+        self.assertEqual(mock_render.call_count, 1)
+        self.assertEqual(response.content, b'cached')
+
+    @patch('recipes.views.render_chart', return_value=b'cached')
+    def test_recipe_changes_invalidate_cache(self, mock_render):
+        """Test that saving or deleting a recipe bumps the data version"""
+        url = reverse('recipes:recipes_chart', args=['pie', 'png'])
+        version = get_data_version()
+        etag = self.client.get(url)['ETag']
+        self.recipe.cooking_time = 20
+        self.recipe.save()
+        self.assertNotEqual(get_data_version(), version)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_render.call_count, 2)
+
+        version = get_data_version()
+        self.recipe.delete()
+        self.assertNotEqual(get_data_version(), version)
+
+    def test_version_bumped_again_on_commit(self):
+        """Test that a save bumps the version again once its transaction commits"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.recipe.ingredients = "pasta, cheese"
+            self.recipe.save()
+            version = get_data_version()
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_data_version(), version)
+
+
+@override_settings(RECIPES_CHART_BACKEND='matplotlib')
+class ChartPoolTest(TestCase):
+    """Test rendering charts in worker processes"""
+
+    stats = {'total': 2, 'difficulty': {'Easy': 2}, 'time_category': {'Quick (≤15 min)': 2}, 'time_range': {1: 2}}
+
+    def setUp(self):
+        """Start each test with a fresh pool"""
+        chart_pool.shutdown_pool()
+        self.addCleanup(chart_pool.shutdown_pool)
+
+    @override_settings(RECIPES_CHART_WORKERS=1, RECIPES_CHART_TIMEOUT=60)
+    def test_render_in_worker(self):
+        """Test that a worker process returns the rendered image"""
+        chart = chart_pool.render_chart('line', self.stats, 'svg')
+        self.assertIn(b'<svg', chart)
+
+    @override_settings(RECIPES_CHART_WORKERS=1, RECIPES_CHART_QUEUE_SIZE=1)
+    def test_full_queue_is_refused(self):
+        """Test that renders are refused instead of queued when the pool is saturated"""
+        pool, slots = chart_pool.get_pool()
+        slots.acquire()
+        try:
+            self.assertIsNone(chart_pool.render_chart('bar', self.stats))
+        finally:
+            slots.release()
+
+    @override_settings(RECIPES_CHART_WORKERS=1, RECIPES_CHART_TIMEOUT=0)
+    def test_timeout_returns_none(self):
+        """Test that a slow render is abandoned, waiting in a thread or on the event loop"""
+        with self.assertLogs('recipes.chart_pool', 'WARNING') as logs:
+            self.assertIsNone(chart_pool.render_chart('pie', self.stats))
+            self.assertIsNone(async_to_sync(chart_pool.arender_chart)('pie', self.stats))
+        self.assertEqual(logs.output, ['WARNING:recipes.chart_pool:pie chart render timed out'] * 2)
+
+    @override_settings(RECIPES_CHART_WORKERS=1, RECIPES_CHART_TIMEOUT=60)
+    def test_worker_error_is_logged(self):
+        """Test that a render failing in the worker is logged with its traceback"""
+        with self.assertLogs('recipes.chart_pool', 'ERROR') as logs:
+            self.assertIsNone(chart_pool.render_chart('radar', self.stats))
+        self.assertIn('KeyError', logs.output[0])
+
+    def test_pool_does_not_import_matplotlib(self):
+        """Test that starting the pool leaves matplotlib to the workers"""
+        result = subprocess.run(
+            [sys.executable, '-c', 'import sys, django; django.setup(); from recipes import chart_pool; '
+                                   'chart_pool.get_pool(); print("matplotlib" in sys.modules)'],
+            cwd=Path(__file__).resolve().parent.parent,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), 'False')
+
+    @override_settings(RECIPES_CHART_WORKERS=1, RECIPES_CHART_TIMEOUT=60)
+    async def test_async_render_in_worker(self):
+        """Test that the async renderer awaits the worker process"""
+        chart = await chart_pool.arender_chart('line', self.stats, 'svg')
+        self.assertIn(b'<svg', chart)
+
+    @patch('recipes.chart_pool.arender_chart', return_value=None)
+    def test_unavailable_placeholder(self, mock_render):
+        """Test that the chart endpoint serves an uncached placeholder when rendering fails"""
+        get_chart_cache().clear()
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread")
+        response = self.client.get(reverse('recipes:recipes_chart', args=['pie', 'png']))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn(b'Chart unavailable', response.content)
+        self.assertIn('no-store', response['Cache-Control'])
+
+
+class SvgChartsTest(TestCase):
+    """Test the pure-Python SVG chart backend"""
+
+    stats = {
+        'total': 6,
+        'difficulty': {'Easy': 3, 'Medium': 2, 'Hard': 1},
+        'time_category': {'Quick (≤15 min)': 3, 'Very Long (>60 min)': 3},
+        'time_range': {0: 1, 1: 2, 9: 3},
+    }
+
+    def texts(self, chart):
+        root = ElementTree.fromstring(chart)
+        return [element.text for element in root.iter('{http://www.w3.org/2000/svg}text')]
+
+    def test_charts_are_valid_svg(self):
+        """Test that each chart is well-formed SVG with its title and labels"""
+        pie = self.texts(svg_charts.render('pie', self.stats))
+        self.assertEqual(pie[0], 'Recipe Distribution by Cooking Time')
+        self.assertEqual(pie.count('50.0%'), 2)
+        self.assertIn('Quick (≤15 min)', pie)
+
+        bar = self.texts(svg_charts.render('bar', self.stats))
+        self.assertIn('Difficulty Level', bar)
+        # Value labels, largest bar first
+        self.assertLess(bar.index('Easy'), bar.index('Hard'))
+        self.assertIn('3', bar)
+
+        line = svg_charts.render('line', self.stats)
+        self.assertIn('90-99', self.texts(line))
+        root = ElementTree.fromstring(line)
+        self.assertEqual(len(list(root.iter('{http://www.w3.org/2000/svg}circle'))), 10)
+
+    def test_single_slice_and_escaping(self):
+        """Test a pie of one category and labels that need escaping"""
+        stats = {'total': 1, 'difficulty': {'<Easy & fast>': 1}, 'time_category': {'Quick': 1}, 'time_range': {}}
+        pie = svg_charts.render('pie', stats)
+        self.assertIn(b'<circle', pie)
+        self.assertIn('<Easy & fast>', self.texts(svg_charts.render('bar', stats)))
+        with self.assertRaises(ValueError):
+            svg_charts.render('bar', stats, 'png')
+
+    def test_nice_ticks(self):
+        """Test that the value axis uses round steps up to the largest count"""
+        self.assertEqual(svg_charts.nice_ticks(3), [0, 1, 2, 3])
+        self.assertEqual(svg_charts.nice_ticks(130), [0, 50, 100, 150])
+        self.assertEqual(svg_charts.nice_ticks(0), [0, 1])
+
+    @override_settings(RECIPES_CHART_WORKERS=1)
+    def test_endpoint_renders_in_request(self):
+        """Test that SVG charts skip the worker pool"""
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_login(user)
+        Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread")
+        get_chart_cache().clear()
+        with patch('recipes.chart_pool.submit') as submit:
+            response = self.client.get(reverse('recipes:recipes_chart', args=['bar', 'svg']))
+        submit.assert_not_called()
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'Recipe Distribution by Difficulty Level', response.content)
+
+
+class RecipeDifficultyIndexTest(TestCase):
+    """Test the difficulty index and the bulk difficulty recompute"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.quick = Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread")
+        self.slow = Recipe.objects.create(name="Stew", cooking_time=90, ingredients="beef, carrot")
+
+    def plan(self, data):
+        recipes, _ = filter_recipes(RecipeSearchForm(data))
+        return recipes.order_by().explain()
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite syntax')
+    def test_difficulty_filter_uses_index(self):
+        """Test that the form's difficulty filters search the index instead of scanning"""
+        self.assertIn('USING INDEX recipe_difficulty_time_idx (difficulty=?)', self.plan({'difficulty': 'Easy'}))
+        plan = self.plan({'difficulty': 'Easy', 'cooking_time_min': 5, 'cooking_time_max': 30})
+        self.assertIn('USING INDEX recipe_difficulty_time_idx (difficulty=? AND cooking_time>? AND cooking_time<?)', plan)
+        self.assertNotIn('SCAN recipes_recipe', plan)
+
+    def test_recompute_command(self):
+        """Test that stale difficulties are re-derived in bulk"""
+        # update() bypasses Recipe.save, leaving the stored values stale
+        Recipe.objects.filter(pk=self.quick.pk).update(difficulty='Hard')
+        Recipe.objects.filter(pk=self.slow.pk).update(ingredients="beef")
+        stdout = StringIO()
+        call_command('recompute_difficulty', '--dry-run', stdout=stdout)
+        self.assertIn('Would update the difficulty of 1 recipes', stdout.getvalue())
+        self.assertEqual(Recipe.objects.get(pk=self.quick.pk).difficulty, 'Hard')
+
+        version = get_data_version()
+        call_command('recompute_difficulty', '--recount', stdout=stdout)
+        self.assertIn('Updated the difficulty of 1 recipes (1 ingredient counts corrected)', stdout.getvalue())
+        self.assertEqual(Recipe.objects.get(pk=self.quick.pk).difficulty, 'Easy')
+        self.assertEqual(Recipe.objects.get(pk=self.slow.pk).ingredient_count, 1)
+        self.assertNotEqual(get_data_version(), version)
+
+    def test_recompute_keeps_hand_picked(self):
+        """Test that a difficulty picked by hand survives the recompute"""
+        picked = Recipe.objects.create(name="Souffle", cooking_time=20, ingredients="eggs, cheese", difficulty="Hard")
+        self.assertTrue(picked.difficulty_override)
+        self.assertFalse(self.quick.difficulty_override)
+        Recipe.objects.filter(pk=self.quick.pk).update(difficulty='Medium')
+        stdout = StringIO()
+        call_command('recompute_difficulty', stdout=stdout)
+        self.assertEqual(Recipe.objects.get(pk=picked.pk).difficulty, 'Hard')
+        self.assertEqual(Recipe.objects.get(pk=self.quick.pk).difficulty, 'Easy')
+        self.assertIn('Updated the difficulty of 1 recipes', stdout.getvalue())
+        self.assertIn('Medium -> Easy: 1', stdout.getvalue())
+        self.assertIn('1 hand-picked difficulties left alone', stdout.getvalue())
+
+        # Clearing it hands the difficulty back to the rule
+        picked.difficulty = ''
+        picked.save()
+        self.assertEqual(picked.difficulty, 'Easy')
+        self.assertFalse(picked.difficulty_override)
+
+    def test_recompute_single_update_query(self):
+        """Test that the recompute is one UPDATE, however many recipes there are"""
+        Recipe.objects.update(difficulty='Medium')
+        with CaptureQueriesContext(connection) as queries:
+            call_command('recompute_difficulty', stdout=StringIO())
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(list(Recipe.objects.order_by('id').values_list('difficulty', flat=True)), ['Easy', 'Hard'])
+
+
+class RecipePageCacheTest(TestCase):
+    """Test response caching and revalidation for the detail page and the unfiltered list"""
+
+    def setUp(self):
+        """Set up test data"""
+        get_page_cache().clear()
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.recipe = Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread")
+        self.url = reverse('recipes:recipes_detail', args=[self.recipe.pk])
+
+    def recipe_queries(self, url, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **kwargs)
+        return response, [query['sql'] for query in queries if 'recipes_recipe' in query['sql']]
+
+    def test_timestamps(self):
+        """Test that recipes record when they were created and last changed"""
+        created_at, updated_at = self.recipe.created_at, self.recipe.updated_at
+        self.assertIsNotNone(created_at)
+        self.recipe.name = "French toast"
+        self.recipe.save()
+        self.assertEqual(self.recipe.created_at, created_at)
+        self.assertGreater(self.recipe.updated_at, updated_at)
+
+    def test_detail_cached(self):
+        """Test that a repeated detail request is served without a recipe query"""
+        response, queries = self.recipe_queries(self.url)
+        self.assertContains(response, 'Toast')
+        # The recipe and its similar recipes
+        self.assertEqual(len(queries), 2)
+        self.assertGreaterEqual(parse_http_date(response['Last-Modified']), int(self.recipe.updated_at.timestamp()))
+        self.assertIn('no-cache', response['Cache-Control'])
+        cached, queries = self.recipe_queries(self.url)
+        self.assertEqual(queries, [])
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_detail_revalidation(self):
+        """Test that browsers get a 304 for an unchanged recipe"""
+        response = self.client.get(self.url)
+        not_modified = self.client.get(self.url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        not_modified = self.client.get(self.url, headers={'if-modified-since': response['Last-Modified']})
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_detail_invalidated_on_save(self):
+        """Test that saving or deleting a recipe drops its cached page"""
+        etag = self.client.get(self.url)['ETag']
+        self.recipe.name = "French toast"
+        self.recipe.save()
+        response = self.client.get(self.url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'French toast')
+        self.assertNotEqual(response['ETag'], etag)
+        self.recipe.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_late_detail_write_not_served(self):
+        """Test that a page rendered from rows read before a save is not served after it"""
+        version = detail_page_version(self.recipe.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = "French toast"
+            self.recipe.save()
+        # A slow request that read the old row stores its page after the invalidation
+        stale = {'content': b'Toast', 'etag': '"stale"', 'last_modified': 0}
+        get_page_cache().set(detail_cache_key(self.recipe.pk), stale, version=version)
+        self.assertContains(self.client.get(self.url), 'French toast')
+
+    def test_recompute_clears_detail_pages(self):
+        """Test that bulk difficulty updates, which skip signals, drop cached pages"""
+        self.client.get(self.url)
+        Recipe.objects.update(difficulty='Hard')
+        call_command('recompute_difficulty', stdout=StringIO())
+        self.assertContains(self.client.get(self.url), 'Easy')
+
+    def test_unfiltered_list_cached(self):
+        """Test that the unfiltered list is cached until a recipe changes"""
+        url = reverse('recipes:recipes_list')
+        response, queries = self.recipe_queries(url)
+        self.assertTrue(queries)
+        cached, queries = self.recipe_queries(url)
+        self.assertEqual(queries, [])
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(self.client.get(url, headers={'if-none-match': response['ETag']}).status_code, 304)
+
+        Recipe.objects.create(name="Porridge", cooking_time=10, ingredients="oats")
+        response = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Porridge')
+
+    def test_filtered_list_not_cached(self):
+        """Test that searches are rendered for each request"""
+        url = reverse('recipes:recipes_list')
+        response, _ = self.recipe_queries(url, data={'recipe_name': 'toast'})
+        self.assertNotIn('ETag', response)
+        _, queries = self.recipe_queries(url, data={'recipe_name': 'toast'})
+        self.assertTrue(queries)
+
+
+class RecipeCardCacheTest(TestCase):
+    """Test the external stylesheets and the cached recipe cards on the list page"""
+
+    def setUp(self):
+        """Set up test data"""
+        get_page_cache().clear()
+        caches['template_fragments'].clear()
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.recipe = Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread")
+
+    def search(self):
+        # Searches aren't page cached, so the template is rendered every time
+        return self.client.get(reverse('recipes:recipes_list'), {'cooking_time_max': 30})
+
+    def test_styles_are_linked(self):
+        """Test that pages link stylesheets instead of inlining them"""
+        for url in (reverse('recipes:recipes_home'), reverse('recipes:recipes_list'),
+                    reverse('recipes:recipes_detail', args=[self.recipe.pk])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotContains(response, '<style')
+                self.assertContains(response, '<link rel="stylesheet" href="/static/recipes/css/base.css">')
+
+    def test_card_cached_until_recipe_changes(self):
+        """Test that a card is rendered once and re-rendered after the recipe is saved"""
+        self.assertContains(self.search(), 'Toast')
+        with patch.object(Recipe, 'thumbnail_srcset', new_callable=PropertyMock) as srcset:
+            self.assertContains(self.search(), 'Toast')
+            srcset.assert_not_called()
+            self.recipe.name = "French toast"
+            self.recipe.save()
+            self.assertContains(self.search(), 'French toast')
+            srcset.assert_called_once()
+
+    def test_bulk_invalidation_clears_cards(self):
+        """Test that invalidating every recipe drops the cached cards"""
+        self.search()
+        Recipe.objects.filter(pk=self.recipe.pk).update(name="Rye toast")
+        self.assertNotContains(self.search(), 'Rye toast')
+        invalidate_recipes()
+        self.assertContains(self.search(), 'Rye toast')
+
+    def test_bulk_invalidation_keeps_other_entries(self):
+        """Test that invalidating every recipe leaves unrelated entries in the shared caches"""
+        for cache in (get_page_cache(), caches['template_fragments'], caches['sessions']):
+            cache.set('unrelated', 'kept')
+        invalidate_recipes()
+        for cache in (get_page_cache(), caches['template_fragments'], caches['sessions']):
+            self.assertEqual(cache.get('unrelated'), 'kept')
+
+
+class RecipeImportExportTest(TestCase):
+    """Test the import_recipes and export_recipes commands"""
+
+    def setUp(self):
+        """Point media storage and the input files at temporary directories"""
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.files = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.files)
+
+    def import_recipes(self, name, content, *args):
+        path = self.files / name
+        path.write_text(content)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_recipes', str(path), *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_vectorized_difficulty_matches_save(self):
+        """Test that the batch difficulty rule agrees with Recipe.save"""
+        cases = [(10, 2), (29, 4), (30, 4), (45, 9), (59, 10), (60, 1), (120, 20)]
+        self.assertEqual(
+            calculate_difficulties([t for t, _ in cases], [c for _, c in cases]),
+            [calculate_difficulty(t, c) for t, c in cases],
+        )
+
+    def test_import_csv(self):
+        """Test importing a CSV file in batches"""
+        stdout, stderr = self.import_recipes('recipes.csv', (
+            'name,ingredients,cooking_time,difficulty\n'
+            'Toast,"Bread, Butter",5,\n'
+            'Stew,"beef, carrot, onion",90,Medium\n'
+            ',nothing,5,\n'
+            'Soup,water,soon,\n'
+        ), '--batch-size', '1')
+        self.assertIn('2 created', stdout)
+        self.assertIn('2 skipped', stdout)
+        self.assertIn('rows/sec', stdout)
+        self.assertIn('Row 3 skipped', stderr)
+        toast = Recipe.objects.get(name='Toast')
+        self.assertEqual(toast.difficulty, 'Easy')
+        self.assertEqual(toast.ingredient_count, 2)
+        self.assertEqual(toast.pic.name, 'no_picture.jpeg')
+        self.assertEqual(sorted(toast.ingredient_list.values_list('name', flat=True)), ['bread', 'butter'])
+        self.assertEqual(Recipe.objects.get(name='Stew').difficulty, 'Medium')
+        self.assertEqual(list(search_recipes(Recipe.objects.all(), 'toa')), [toast])
+
+    def test_import_invalidates_cached_charts(self):
+        """Test that a bulk import bumps the chart data version"""
+        version = get_data_version()
+        self.import_recipes('recipes.jsonl', '{"name": "Toast", "ingredients": ["bread"], "cooking_time": 5}\n')
+        self.assertNotEqual(get_data_version(), version)
+
+    def test_failed_import_invalidates_committed_batches(self):
+        """Test that batches written before an import fails still bump the version"""
+        version = get_data_version()
+        with self.assertRaises(CommandError):
+            self.import_recipes(
+                'recipes.jsonl',
+                '{"name": "Toast", "ingredients": ["bread"], "cooking_time": 5}\n{broken\n',
+                '--batch-size', '1',
+            )
+        self.assertTrue(Recipe.objects.filter(name="Toast").exists())
+        self.assertNotEqual(get_data_version(), version)
+
+    def test_export_and_update(self):
+        """Test that an export can be edited and imported back over the same recipes"""
+        recipe = Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread")
+        path = self.files / 'recipes.jsonl'
+        stderr = StringIO()
+        call_command('export_recipes', str(path), stderr=stderr)
+        self.assertIn('Exported 1 recipes', stderr.getvalue())
+        row = json.loads(path.read_text())
+        self.assertEqual(row['id'], recipe.id)
+        self.assertEqual(row['pic'], 'no_picture.jpeg')
+
+        row_updated_at = recipe.updated_at
+        version = detail_page_version(recipe.id)
+        row.update(name='French toast', ingredients='bread, egg')
+        stdout, _ = self.import_recipes('edited.jsonl', json.dumps(row) + '\n', '--update')
+        self.assertIn('1 updated', stdout)
+        self.assertNotEqual(detail_page_version(recipe.id), version)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'French toast')
+        self.assertGreater(recipe.updated_at, row_updated_at)
+        self.assertEqual(sorted(recipe.ingredient_list.values_list('name', flat=True)), ['bread', 'egg'])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_export_csv_round_trip(self):
+        """Test that a CSV export imports as new recipes without --update"""
+        Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread, butter")
+        path = self.files / 'recipes.csv'
+        call_command('export_recipes', str(path), stderr=StringIO())
+        stdout = StringIO()
+        call_command('import_recipes', str(path), stdout=stdout, stderr=StringIO())
+        self.assertIn('1 created', stdout.getvalue())
+        self.assertEqual(list(Recipe.objects.values_list('name', 'ingredients')), [('Toast', 'bread, butter')] * 2)
+
+    def test_invalid_names_and_pictures_skipped(self):
+        """Test that non-text names and picture paths outside the media and pictures folders are row errors"""
+        secret = Path(self.media_root).parent / 'secret.jpg'
+        rows = [
+            {'name': ['Toast'], 'cooking_time': 5},
+            {'name': 2024, 'cooking_time': 5},
+            {'name': 'Soup', 'cooking_time': 5, 'pic': '../secret.jpg'},
+            {'name': 'Stew', 'cooking_time': 5, 'pic': str(secret)},
+            {'name': 'Salad', 'cooking_time': 5, 'pic': {'path': 'salad.jpg'}},
+        ]
+        stdout, stderr = self.import_recipes(
+            'recipes.jsonl', ''.join(json.dumps(row) + '\n' for row in rows), '--pictures-dir', str(self.files),
+        )
+        self.assertIn('1 created', stdout)
+        self.assertIn('4 skipped', stdout)
+        self.assertIn('Row 1 skipped: name must be text', stderr)
+        self.assertIn("Row 3 skipped: picture path '../secret.jpg' must be relative", stderr)
+        self.assertIn('Row 4 skipped: picture path', stderr)
+        self.assertIn('Row 5 skipped: pic must be text', stderr)
+        self.assertEqual(list(Recipe.objects.values_list('name', flat=True)), ['2024'])
+
+    def test_pictures_copied_to_media(self):
+        """Test that pictures are copied into MEDIA_ROOT/recipes and thumbnailed"""
+        Image.new('RGB', (800, 400), 'orange').save(self.files / 'chili.jpg')
+        self.import_recipes('recipes.csv', (
+            'name,ingredients,cooking_time,pic\n'
+            'Chili,beans,60,chili.jpg\n'
+            'Chili again,beans,60,chili.jpg\n'
+            'Ghost,air,1,missing.jpg\n'
+        ), '--pictures-dir', str(self.files))
+        chili, again, ghost = Recipe.objects.order_by('id')
+        self.assertEqual(chili.pic.name, 'recipes/chili.jpg')
+        self.assertEqual(again.pic.name, 'recipes/chili.jpg')
+        self.assertTrue(Path(self.media_root, 'recipes', 'chili.jpg').is_file())
+        self.assertIn('320w', chili.thumbnail_srcset)
+        self.assertEqual(ghost.pic.name, 'no_picture.jpeg')
+
+
+class RecipeStatsTest(TestCase):
+    """Test the incrementally maintained recipe statistics"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.soup = Recipe.objects.create(name="Soup", cooking_time=20, ingredients="water, salt")
+        self.stew = Recipe.objects.create(name="Stew", cooking_time=90, ingredients="beef, carrots, onion")
+
+    def assertStatsCurrent(self):
+        self.assertEqual(stats_differences(), {})
+
+    def test_save_and_delete(self):
+        """Test that creating, changing and deleting recipes moves their counts"""
+        self.assertEqual(stored_counts(), Counter({('Easy', 20): 1, ('Hard', 90): 1}))
+        soup = Recipe.objects.get(pk=self.soup.pk)
+        soup.cooking_time = 45
+        soup.save()
+        soup.ingredients = 'a, b, c, d, e, f'
+        soup.save()
+        self.assertEqual(stored_counts(), Counter({('Medium', 45): 1, ('Hard', 90): 1}))
+        self.stew.delete()
+        Recipe.objects.filter(pk=self.soup.pk).delete()
+        self.assertEqual(stored_counts(), Counter())
+        self.assertStatsCurrent()
+
+    def test_unloaded_and_deferred_saves(self):
+        """Test that saves without the stored values still replace the old count"""
+        Recipe(pk=self.soup.pk, name="Soup", cooking_time=200, ingredients="water").save(
+            update_fields=['name', 'cooking_time', 'ingredients', 'ingredient_count', 'difficulty']
+        )
+        self.assertStatsCurrent()
+        stew = Recipe.objects.only('name').get(pk=self.stew.pk)
+        stew.cooking_time = 10
+        stew.save()
+        self.assertStatsCurrent()
+
+    def test_import_updates_stats(self):
+        """Test that bulk imports, which skip the signals, keep the counts current"""
+        path = Path(tempfile.mkdtemp()) / 'recipes.jsonl'
+        self.addCleanup(shutil.rmtree, path.parent)
+        path.write_text(
+            json.dumps({'id': self.soup.pk, 'name': 'Soup', 'ingredients': 'water', 'cooking_time': 5}) + '\n'
+            + json.dumps({'name': 'Tea', 'ingredients': 'tea', 'cooking_time': 5}) + '\n'
+        )
+        call_command('import_recipes', str(path), '--update', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(stored_counts()[('Easy', 5)], 2)
+        self.assertStatsCurrent()
+
+    def test_reconcile_command(self):
+        """Test that the reconcile command reports and repairs drifted counts"""
+        Recipe.objects.bulk_create([Recipe(name="Toast", cooking_time=5, ingredients="bread", difficulty='Easy')])
+        out = StringIO()
+        call_command('reconcile_recipe_stats', '--dry-run', stdout=out)
+        self.assertIn('Easy, 5 min: stored 0, counted 1', out.getvalue())
+        self.assertNotEqual(stats_differences(), {})
+        call_command('reconcile_recipe_stats', stdout=StringIO())
+        self.assertStatsCurrent()
+        out = StringIO()
+        call_command('reconcile_recipe_stats', stdout=out)
+        self.assertIn('up to date', out.getvalue())
+
+    def test_unfiltered_dashboard_reads_stats_table(self):
+        """Test that unfiltered stats come from the table and match the aggregate"""
+        expected = recipe_stats(Recipe.objects.all())
+        self.assertEqual(async_to_sync(asummary_stats)(), expected)
+        get_chart_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            stats = async_to_sync(astats_for)(Recipe.objects.all(), {'recipe_name': '', 'ingredient_match': 'any'})
+        self.assertEqual(stats, expected)
+        self.assertIn('recipes_recipestats', queries[-1]['sql'])
+        self.assertNotIn('"recipes_recipe"', queries[-1]['sql'])
+
+    def test_cooking_time_summary(self):
+        """Test that the shortest, longest and mean times follow saves and deletes"""
+        summary = async_to_sync(asummary_stats)()['cooking_time']
+        self.assertEqual(summary, {'min': 20, 'max': 90, 'mean': 55})
+        Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread")
+        self.stew.delete()
+        summary = async_to_sync(asummary_stats)()['cooking_time']
+        self.assertEqual(summary, {'min': 5, 'max': 20, 'mean': 12.5})
+        self.assertEqual(summary, recipe_stats(Recipe.objects.all())['cooking_time'])
+        filtered = recipe_stats(Recipe.objects.filter(cooking_time__gt=10))['cooking_time']
+        self.assertEqual(filtered, {'min': 20, 'max': 20, 'mean': 20})
+
+
+@override_settings(RECIPES_SIMILAR_COUNT=3)
+class RecipeSimilarityTest(TestCase):
+    """Test the precomputed similar recipes lists"""
+
+    def setUp(self):
+        """Set up test data"""
+        get_page_cache().clear()
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.soup = Recipe.objects.create(name="Soup", cooking_time=20, ingredients="water, salt, carrots, onion")
+        self.stew = Recipe.objects.create(name="Stew", cooking_time=90, ingredients="beef, carrots, onion, salt")
+        self.salad = Recipe.objects.create(name="Salad", cooking_time=5, ingredients="lettuce, carrots")
+        self.tea = Recipe.objects.create(name="Tea", cooking_time=5, ingredients="tea, water")
+
+    def stored(self):
+        rows = RecipeSimilarity.objects.order_by('recipe_id', '-score', 'similar_id')
+        return [(row.recipe_id, row.similar_id, row.score) for row in rows]
+
+    def assertListsCurrent(self):
+        stored = self.stored()
+        rebuild_similar_recipes()
+        self.assertEqual(stored, self.stored())
+
+    def test_scores(self):
+        """Test that similarity is the Jaccard index of the ingredient sets"""
+        self.assertEqual(similarity_scores(self.soup.pk), {self.stew.pk: 3 / 5, self.salad.pk: 1 / 5, self.tea.pk: 1 / 5})
+        self.assertEqual(
+            list(self.soup.similarities.order_by('-score', 'similar_id').values_list('similar_id', flat=True)),
+            [self.stew.pk, self.salad.pk, self.tea.pk],
+        )
+        self.assertListsCurrent()
+
+    def test_incremental_updates_match_rebuild(self):
+        """Test that saves and deletes leave the lists a full rebuild would build"""
+        names = ['water', 'salt', 'carrots', 'onion', 'beef', 'rice', 'egg', 'milk']
+        recipes = [
+            Recipe.objects.create(name=f"Recipe {i}", cooking_time=10,
+                                  ingredients=', '.join(names[j] for j in range(len(names)) if (i * 7 + j * 3) % 5 < 2))
+            for i in range(12)
+        ]
+        self.assertListsCurrent()
+        for i, recipe in enumerate(recipes[:6]):
+            recipe.ingredients = ', '.join(names[(i + j) % len(names)] for j in range(i % 3 + 1))
+            recipe.save()
+            self.assertListsCurrent()
+        recipes[6].delete()
+        self.stew.delete()
+        self.assertListsCurrent()
+
+    def test_detail_shows_similar_recipes(self):
+        """Test that the detail page lists the precomputed similar recipes, best first"""
+        response = self.client.get(reverse('recipes:recipes_detail', args=[self.soup.pk]))
+        self.assertEqual(response.context['similar_recipes'], [self.stew, self.salad, self.tea])
+        self.assertContains(response, reverse('recipes:recipes_detail', args=[self.stew.pk]))
+
+    def test_changes_drop_cached_detail_pages(self):
+        """Test that detail pages listing a changed recipe are rendered again"""
+        url = reverse('recipes:recipes_detail', args=[self.soup.pk])
+        etag = self.client.get(url)['ETag']
+        self.stew.name = "Beef stew"
+        self.stew.save()
+        # The soup itself didn't change, but the browser's copy is stale
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Beef stew")
+        self.salad.ingredients = "lettuce, carrots, onion, salt, water"
+        self.salad.save()
+        response = self.client.get(url)
+        self.assertEqual(response.context['similar_recipes'], [self.salad, self.stew, self.tea])
+
+    def test_import_and_rebuild_command(self):
+        """Test that imports update the lists and the command rebuilds them"""
+        path = Path(tempfile.mkdtemp()) / 'recipes.jsonl'
+        self.addCleanup(shutil.rmtree, path.parent)
+        path.write_text(
+            json.dumps({'id': self.tea.pk, 'name': 'Tea', 'ingredients': 'water, salt', 'cooking_time': 5}) + '\n'
+            + json.dumps({'name': 'Broth', 'ingredients': 'water, salt, onion', 'cooking_time': 5}) + '\n'
+        )
+        call_command('import_recipes', str(path), '--update', stdout=StringIO(), stderr=StringIO())
+        self.assertListsCurrent()
+        RecipeSimilarity.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_similar_recipes', stdout=out)
+        self.assertIn('Stored 14 similar recipes', out.getvalue())
+        self.assertEqual(self.soup.similarities.count(), 3)
+
+
+class AutocompleteTest(TestCase):
+    """Test the search form's typeahead suggestions"""
+
+    def setUp(self):
+        """Set up test data"""
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.url = reverse('recipes:recipes_autocomplete')
+        Recipe.objects.create(name="Carrot Soup", cooking_time=20, ingredients="Carrots, water, salt")
+        Recipe.objects.create(name="carrot  soup", cooking_time=25, ingredients="carrots, onion")
+        Recipe.objects.create(name="Caramel", cooking_time=15, ingredients="sugar, cream")
+        Recipe.objects.create(name="Beef Stew", cooking_time=90, ingredients="beef, carrots, caraway")
+
+    def suggest(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_prefix_index(self):
+        """Test that lookups are case-insensitive prefixes, in order and without duplicates"""
+        index = autocomplete.PrefixIndex(["Carrot Soup", "carrot  soup", "Caramel", "Beef Stew", "  "])
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.complete("CAR"), ["Caramel", "Carrot Soup"])
+        self.assertEqual(index.complete("carrot s"), ["Carrot Soup"])
+        self.assertEqual(index.complete("car", limit=1), ["Caramel"])
+        self.assertEqual(index.complete("x"), [])
+        self.assertEqual(index.complete(" "), [])
+
+    def test_suggestions(self):
+        """Test that names and the last ingredient typed are completed"""
+        self.assertEqual(self.suggest(q='car'), ['Caramel', 'Carrot Soup'])
+        self.assertEqual(self.suggest(field='ingredients', q='beef, car'), ['caraway', 'carrots'])
+        self.assertEqual(self.suggest(field='ingredients', q='car', limit=1), ['caraway'])
+        self.assertEqual(self.suggest(q=''), [])
+
+    def test_invalid_parameters(self):
+        """Test that unknown fields and bad limits are rejected"""
+        self.assertEqual(self.client.get(self.url, {'field': 'pic', 'q': 'a'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'a', 'limit': 'many'}).status_code, 400)
+
+    def test_login_required(self):
+        """Test that suggestions need a login like the rest of the API"""
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url, {'q': 'car'}).status_code, 302)
+
+    def test_index_follows_recipe_changes(self):
+        """Test that the index is built once per data version and rebuilt after changes"""
+        self.suggest(q='car')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.suggest(q='beef'), ['Beef Stew'])
+        self.assertFalse([query for query in queries if 'recipes_' in query['sql']])
+        Recipe.objects.create(name="Carbonara", cooking_time=20, ingredients="pasta, eggs")
+        self.assertEqual(self.suggest(q='carb'), ['Carbonara'])
+        self.assertEqual(self.suggest(field='ingredients', q='pa'), ['pasta'])
+
+    @override_settings(RECIPES_DATA_VERSION_TIMEOUT=60)
+    def test_index_expires(self):
+        """Test that a per-process index is rebuilt once it is older than the version timeout"""
+        self.suggest(q='car')
+        # Added by another process, whose version bump this one can't see
+        Recipe.objects.bulk_create([Recipe(name="Carbonara", cooking_time=20, ingredients="pasta", difficulty='Easy')])
+        self.assertEqual(self.suggest(q='carb'), [])
+        with patch('recipes.autocomplete.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual(self.suggest(q='carb'), ['Carbonara'])
+
+    def test_caching_headers(self):
+        """Test that each prefix can be cached by the browser and revalidated"""
+        response = self.client.get(self.url, {'q': 'car'})
+        self.assertIn('max-age=60', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(self.url, {'q': 'CAR '}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        Recipe.objects.create(name="Carbonara", cooking_time=20, ingredients="pasta")
+        self.assertEqual(self.client.get(self.url, {'q': 'car'}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_search_form_links_suggestions(self):
+        """Test that the search form's text fields use the suggestion lists"""
+        response = self.client.get(reverse('recipes:recipes_list'))
+        self.assertContains(response, 'list="recipe-name-suggestions"')
+        self.assertContains(response, '<datalist id="ingredient-suggestions">')
+        self.assertContains(response, 'recipes/js/autocomplete')
+
+
+class AsyncViewTest(TestCase):
+    """Test the recipe views when requests are served through ASGI"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.recipe = Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread, butter")
+
+    async def test_detail_view(self):
+        """Test the async detail view"""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('recipes:recipes_detail', args=[self.recipe.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Toast')
+
+    async def test_detail_view_missing_recipe(self):
+        """Test that an unknown recipe is a 404"""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('recipes:recipes_detail', args=[self.recipe.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_detail_view_requires_login(self):
+        """Test that anonymous users are redirected to the login page"""
+        response = await self.async_client.get(reverse('recipes:recipes_detail', args=[self.recipe.pk]))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_list_view(self):
+        """Test the async list view with a search"""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('recipes:recipes_list'), {'ingredients': 'bread'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Toast')
+        self.assertEqual(response.context['total_results'], 1)
+
+    async def test_login_view(self):
+        """Test logging in and out through the async auth views"""
+        response = await self.async_client.post(reverse('login'), {'username': 'testuser', 'password': 'testpass123'})
+        self.assertRedirects(response, reverse('recipes:recipes_list'), fetch_redirect_response=False)
+        response = await self.async_client.get(reverse('recipes:recipes_list'))
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(reverse('logout'))
+        self.assertRedirects(response, reverse('logout_success'), fetch_redirect_response=False)
+
+
+class CachedAuthTest(TestCase):
+    """Test that logged in browsing is served from the session and user caches"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.recipe = Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread")
+        self.url = reverse('recipes:recipes_detail', args=[self.recipe.pk])
+
+    def log_in(self):
+        response = self.client.post(reverse('login'), {'username': 'testuser', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, 302)
+        self.client.get(self.url)
+
+    def test_browsing_without_queries(self):
+        """Test that a cached page for a logged in user needs no queries at all"""
+        self.log_in()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        """Test the cookie session engine, which has no server-side session store"""
+        self.log_in()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_change_ends_cached_sessions(self):
+        """Test that changing the password logs out sessions even though the user was cached"""
+        self.log_in()
+        self.user.set_password('newpass456')
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_logout_forgets_user(self):
+        """Test that logging out drops the cached user"""
+        self.log_in()
+        self.assertIsNotNone(get_user_cache().get(user_cache_key(self.user.pk)))
+        self.client.get(reverse('logout'))
+        self.assertIsNone(get_user_cache().get(user_cache_key(self.user.pk)))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite journaling')
+class SQLiteConcurrencyTest(TestCase):
+    """Test that reads carry on while another connection is writing"""
+
+    def setUp(self):
+        """Create a recipe table in a temporary database file"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'recipes.sqlite3')
+        with self.open_connection() as writer:
+            with writer.schema_editor(atomic=False) as editor:
+                editor.create_model(Recipe)
+            with writer.cursor() as cursor:
+                cursor.execute("INSERT INTO recipes_recipe (name, ingredients, ingredient_count, cooking_time, "
+                               "difficulty, difficulty_override, pic, created_at, updated_at) "
+                               "VALUES ('Toast', 'bread', 1, 5, 'Easy', 0, '', '2026-01-01', '2026-01-01')")
+
+    @contextmanager
+    def open_connection(self):
+        # A connection to the temporary file, set up like the default one
+        wrapper = connections['default'].__class__({**connection.settings_dict, 'NAME': self.path}, alias='concurrency')
+        try:
+            yield wrapper
+        finally:
+            wrapper.close()
+
+    def read_while_writing(self):
+        """Count recipes from another thread while an exclusive write transaction is open."""
+        result = {}
+
+        def read():
+            start = time.perf_counter()
+            try:
+                with self.open_connection() as reader, reader.cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM recipes_recipe')
+                    result['count'] = cursor.fetchone()[0]
+            except OperationalError as error:
+                result['error'] = str(error)
+            result['seconds'] = time.perf_counter() - start
+
+        with self.open_connection() as writer, writer.cursor() as cursor:
+            # Like an admin save in the middle of committing
+            cursor.execute('BEGIN EXCLUSIVE')
+            cursor.execute("UPDATE recipes_recipe SET name = 'French toast'")
+            cursor.execute("INSERT INTO recipes_recipe (name, ingredients, ingredient_count, cooking_time, "
+                           "difficulty, difficulty_override, pic, created_at, updated_at) "
+                           "VALUES ('Stew', 'beef', 1, 90, 'Hard', 0, '', '2026-01-01', '2026-01-01')")
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join()
+            cursor.execute('COMMIT')
+        return result
+
+    def test_wal_pragmas_applied(self):
+        """Test that new connections get the configured pragmas"""
+        with self.open_connection() as conn, conn.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_reads_during_write_with_wal(self):
+        """Test that a reader sees the last committed data without waiting for the writer"""
+        result = self.read_while_writing()
+        self.assertEqual(result.get('count'), 1)
+        self.assertLess(result['seconds'], 1)
+
+    @override_settings(RECIPES_SQLITE_PRAGMAS={'busy_timeout': 100, 'journal_mode': 'DELETE'})
+    def test_reads_blocked_without_wal(self):
+        """Test that the rollback journal makes the same read fail"""
+        result = self.read_while_writing()
+        self.assertIn('locked', result.get('error', ''))
+
+
+class ConnectionSettingsTest(TestCase):
+    """Test the database connection settings each server entry point starts with"""
+
+    def test_persistent_connections_only_under_wsgi(self):
+        """Test that connections are kept between requests under WSGI only"""
+        env = os.environ.copy()
+        env.pop('RECIPES_CONN_MAX_AGE', None)
+        ages = {}
+        for module in ('wsgi', 'asgi'):
+            result = subprocess.run(
+                [sys.executable, '-c', f'import recipe_project.{module}; from django.db import connection; '
+                                       f'print(connection.settings_dict["CONN_MAX_AGE"])'],
+                cwd=Path(__file__).resolve().parent.parent,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            ages[module] = int(result.stdout)
+        self.assertEqual(ages, {'wsgi': 600, 'asgi': 0})
+
+
+class RequestMetricsTest(TestCase):
+    """Test the request timing middleware and the metrics endpoint"""
+
+    def setUp(self):
+        """Set up test data"""
+        histograms.clear()
+        get_page_cache().clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        Recipe.objects.create(name="Toast", cooking_time=5, ingredients="bread")
+
+    def server_timing(self, response):
+        return dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+
+    def test_server_timing_counts_queries(self):
+        """Test that Server-Timing reports the request's queries and time"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('recipes:recipes_list'), {'recipe_name': 'toast'})
+        timing = self.server_timing(response)
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+        self.assertIn('total', timing)
+        self.assertNotIn('chart', timing)
+
+    @override_settings(RECIPES_CHART_WORKERS=0)
+    def test_server_timing_chart(self):
+        """Test that chart renders are timed separately"""
+        get_chart_cache().clear()
+        response = self.client.get(reverse('recipes:recipes_chart', args=['bar', 'svg']))
+        self.assertIn('chart', self.server_timing(response))
+
+    def test_histograms(self):
+        """Test that requests are recorded per view in Prometheus format"""
+        self.client.get(reverse('recipes:recipes_list'))
+        self.client.get(reverse('recipes:recipes_list'))
+        text = histograms.render()
+        self.assertIn('# TYPE recipes_request_duration_seconds histogram', text)
+        self.assertIn('recipes_request_duration_seconds_count{view="recipes:recipes_list"} 2', text)
+        self.assertIn('recipes_request_duration_seconds_bucket{view="recipes:recipes_list",le="+Inf"} 2', text)
+        self.assertIn('recipes_request_queries_bucket{view="recipes:recipes_list",le="100"} 2', text)
+
+    def test_metrics_staff_only(self):
+        """Test that only staff users can read the metrics"""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('recipes_request_duration_seconds_count{view="metrics"}', response.content.decode())
+
+
+class FileServingTest(TestCase):
+    """Test the media and static file views used with DEBUG off"""
+
+    def setUp(self):
+        """Point media and static storage at temporary directories"""
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, STATIC_ROOT=self.static_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        Path(self.media_root, 'recipes').mkdir()
+        Path(self.media_root, 'recipes', 'soup.jpg').write_bytes(bytes(range(256)) * 4)
+
+    def get(self, path, **headers):
+        response = self.client.get(path, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_media_file(self):
+        """Test a whole media file with its caching headers"""
+        response, body = self.get('/media/recipes/soup.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, bytes(range(256)) * 4)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], '1024')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=86400')
+        self.assertIn('ETag', response)
+
+        response, body = self.get('/media/recipes/soup.jpg', if_none_match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(body, b'')
+
+    def test_range_requests(self):
+        """Test single byte ranges, suffix ranges and unsatisfiable ranges"""
+        response, body = self.get('/media/recipes/soup.jpg', range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, bytes(range(10, 20)))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response, body = self.get('/media/recipes/soup.jpg', range='bytes=-4')
+        self.assertEqual(response['Content-Range'], 'bytes 1020-1023/1024')
+        self.assertEqual(body, bytes(range(252, 256)))
+
+        response, _ = self.get('/media/recipes/soup.jpg', range='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+        # A stale If-Range gets the whole file
+        response, body = self.get('/media/recipes/soup.jpg', range='bytes=0-9', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(body), 1024)
+
+    async def test_asgi_streams_in_chunks(self):
+        """Test that ASGI responses read the file asynchronously instead of buffering it"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            response = await self.async_client.get('/media/recipes/soup.jpg')
+            self.assertTrue(response.is_async)
+            body = b''.join([chunk async for chunk in response.streaming_content])
+            self.assertEqual(body, bytes(range(256)) * 4)
+            self.assertEqual(response['Content-Length'], '1024')
+
+            response = await self.async_client.get('/media/recipes/soup.jpg', headers={'range': 'bytes=10-19'})
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), bytes(range(10, 20)))
+            self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+
+    def test_missing_and_outside_files(self):
+        """Test that missing files, directories and paths outside MEDIA_ROOT are 404s"""
+        for path in ('/media/recipes/nope.jpg', '/media/recipes/', '/media/../manage.py', '/media/%2e%2e/manage.py'):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+
+    @override_settings(RECIPES_SENDFILE='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        """Test that nginx is told which internal location to send"""
+        response, body = self.get('/media/recipes/soup.jpg')
+        self.assertEqual(response['X-Accel-Redirect'], '/_protected/media/recipes/soup.jpg')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(body, b'')
+
+    @override_settings(RECIPES_SENDFILE='x-sendfile')
+    def test_x_sendfile(self):
+        """Test that Apache is given the absolute file path"""
+        response, _ = self.get('/media/recipes/soup.jpg')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'recipes', 'soup.jpg'))
+
+    def test_accepted_encodings(self):
+        """Test that only codings with q=0 are refused"""
+        def accepted(header):
+            return accepted_encodings(RequestFactory().get('/', headers={'accept-encoding': header}))
+        self.assertEqual(accepted('gzip;q=0.8, br;q=0.9'), {'gzip', 'br'})
+        self.assertEqual(accepted('gzip, deflate, BR'), {'gzip', 'deflate', 'br'})
+        self.assertEqual(accepted('gzip;q=0, br ; q=0.000, identity;q=1'), {'identity'})
+        self.assertEqual(accepted('gzip;q=high'), set())
+        self.assertEqual(accepted(''), set())
+
+    def test_static_without_collectstatic(self):
+        """Test that app static files are served before collectstatic has run"""
+        response, body = self.get('/static/recipes/css/list.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, Path(finders.find('recipes/css/list.css')).read_bytes())
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(self.get('/static/recipes/css/missing.css')[0].status_code, 404)
+        self.assertEqual(self.get('/static/recipes/../../models.py')[0].status_code, 404)
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """Test that collected static files are hashed, gzipped and served immutable"""
+        call_command('collectstatic', interactive=False, verbosity=0)
+        # Reload the manifest, which was read before collectstatic wrote it
+        staticfiles_storage._wrapped = empty
+
+        url = staticfiles_storage.url('admin/css/base.css')
+        self.assertRegex(url, r'^/static/admin/css/base\.[0-9a-f]{12}\.css$')
+        self.assertTrue(Path(self.static_root, url[len('/static/'):] + '.gz').is_file())
+        # JPEGs are already compressed
+        self.assertFalse(any(Path(self.static_root, 'recipes', 'images').glob('*.gz')))
+
+        response, body = self.get(url, accept_encoding='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(body), Path(self.static_root, url[len('/static/'):]).read_bytes())
+
+        response, body = self.get(url)
+        self.assertNotIn('Content-Encoding', response)
+        # Unhashed names can change on the next deploy
+        response, _ = self.get('/static/admin/css/base.css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+
+class StartupImportTest(TestCase):
+    """Test that starting a worker does not import the analytics libraries"""
+
+    # Seconds allowed for importing the WSGI app and URLconf, overridable for slow machines
+    IMPORT_TIME_BUDGET = float(os.environ.get('RECIPES_IMPORT_TIME_BUDGET', 1.5))
+
+    def import_times(self):
+        # python -X importtime reports "self | cumulative | module" in microseconds on stderr
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import recipe_project.wsgi; import recipes.urls'],
+            cwd=Path(__file__).resolve().parent.parent,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            own, cumulative, module = line[len('import time:'):].split('|')
+            times[module.strip()] = int(own)
+        return times
+
+    def test_heavy_modules_not_imported(self):
+        """Test that pandas, matplotlib, Pillow and numpy are loaded on first use only"""
+        packages = {module.split('.')[0] for module in self.import_times()}
+        self.assertFalse(packages & {'pandas', 'matplotlib', 'PIL', 'numpy'})
+
+    # Timing depends on the machine, so like the other latency budgets (see
+    # test_performance) it is only enforced when asked for
+    @skipUnless(os.environ.get('RECIPES_PERF_BUDGETS') == '1', 'set RECIPES_PERF_BUDGETS=1 to enforce budgets')
+    def test_import_time_budget(self):
+        """Test that importing the WSGI app stays within the time budget"""
+        # Best of three runs to smooth out a cold file cache
+        elapsed = min(sum(self.import_times().values()) for _ in range(3)) / 1e6
+        self.assertLess(elapsed, self.IMPORT_TIME_BUDGET)
@@ -0,0 +1,68 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+# Pillow is imported when a thumbnail is first needed, not at startup
+
+
+def thumbnail_format():
+    # Prefer WebP, but not every Pillow build is compiled with it
+    from PIL import features
+    if settings.RECIPES_THUMBNAIL_FORMAT == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return settings.RECIPES_THUMBNAIL_FORMAT
+
+
+def thumbnail_name(name, width, fmt):
+    # recipes/chili.jpg -> recipes/thumbs/chili.jpg_320.webp; the source
+    # extension stays so chili.jpg and chili.png don't share thumbnails
+    directory, filename = os.path.split(name)
+    extension = 'jpg' if fmt == 'JPEG' else fmt.lower()
+    return os.path.join(directory, 'thumbs', f'{filename}_{width}.{extension}')
+
+
+def generate_thumbnails(field_file, force=False):
+    """Write a resized copy of an image file for each configured width.
+
+    Widths larger than the original are skipped rather than upscaled.
+    Returns the names of the thumbnails that were written.
+    """
+    from PIL import Image
+    storage = field_file.storage
+    fmt = thumbnail_format()
+    with storage.open(field_file.name) as source:
+        image = Image.open(source)
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    
+    written = []
+    for width in settings.RECIPES_THUMBNAIL_WIDTHS:
+        if width >= image.width:
+            continue
+        name = thumbnail_name(field_file.name, width, fmt)
+        if storage.exists(name):
+            if not force:
+                continue
+            storage.delete(name)
+        height = round(image.height * width / image.width)
+        buffer = BytesIO()
+        image.resize((width, height), Image.LANCZOS).save(
+            buffer, format=fmt, quality=settings.RECIPES_THUMBNAIL_QUALITY, optimize=True
+        )
+        written.append(storage.save(name, ContentFile(buffer.getvalue())))
+    return written
+
+
+def existing_thumbnails(field_file):
+    """Return (url, width) for the thumbnails of an image that exist in storage."""
+    storage = field_file.storage
+    fmt = thumbnail_format()
+    thumbnails = []
+    for width in settings.RECIPES_THUMBNAIL_WIDTHS:
+        name = thumbnail_name(field_file.name, width, fmt)
+        if storage.exists(name):
+            thumbnails.append((storage.url(name), width))
+    return thumbnails
@@ -0,0 +1,36 @@
+"""Timings of the request being handled, reported by the request metrics
+middleware (see recipe_project.middleware).
+
+Code in the app adds its own spans with timed(); outside a request, e.g. in
+management commands, that does nothing.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# A ContextVar follows the request into sync_to_async threads, where async
+# views run their queries
+current_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        # Seconds spent per named span, e.g. "db" and "chart"
+        self.spans = {}
+
+    def add(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's `name` span."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = current_timings.get()
+        if timings is not None:
+            timings.add(name, time.perf_counter() - start)
@@ -1,10 +1,13 @@
 from django.urls import path
-from .views import recipes_home, RecipesListView, RecipesDetailView, recipes_list
+from .views import recipes_home, recipes_list, recipes_detail, recipes_chart, recipes_api, recipes_autocomplete
 
 app_name = 'recipes' 
 
 urlpatterns = [
    path('', recipes_home, name='recipes_home'),
    path("recipes/", recipes_list, name="recipes_list"),  # Changed to function-based view
-   path("recipes/<pk>", RecipesDetailView.as_view(), name="recipes_detail"),
+   path("recipes/charts/<str:kind>.<str:fmt>", recipes_chart, name="recipes_chart"),
+   path("recipes/<int:pk>", recipes_detail, name="recipes_detail"),  # Async function-based view
+   path("api/recipes/", recipes_api, name="recipes_api"),
+   path("api/recipes/autocomplete/", recipes_autocomplete, name="recipes_autocomplete"),
 ]
\ No newline at end of file
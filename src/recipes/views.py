@@ -1,51 +1,101 @@
-from django.shortcuts import render, get_object_or_404
-from django.views.generic import ListView, DetailView
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.shortcuts import render
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.core.paginator import Paginator
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from urllib.parse import urlencode
+import hashlib
+import time
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from io import BytesIO
-import base64
-from .models import Recipe
+from django.db.models import Case, Count, F, IntegerField, Max, Min, Q, Sum, Value, When
+from .models import Recipe, RecipeIngredient, RecipeSimilarity, split_ingredients
 from .forms import RecipeSearchForm
+from .cache import (
+    adetail_page_version, aget_data_version, aget_or_compute_stats, aget_or_render_chart, aget_pages_generation,
+    chart_etag, detail_cache_key, get_page_cache, list_cache_key, normalize_filters,
+)
+from .stats import stats_rows as stored_stats_rows
+from .search import rank_recipes, search_recipes
+from . import autocomplete, chart_pool
 
 def recipes_home(request):
     return render(request, 'recipes/recipes_home.html')
 
-class RecipesListView(LoginRequiredMixin, ListView):
-    model = Recipe
-    template_name = 'recipes/recipes_list.html'
+def cached_page(response, etag, last_modified):
+    # What is kept of a rendered page: enough to answer conditional requests too
+    return {'content': response.content, 'etag': etag, 'last_modified': last_modified}
 
-class RecipesDetailView(LoginRequiredMixin, DetailView):
-    model = Recipe
-    template_name = 'recipes/recipes_detail.html'
+def page_response(request, page):
+    """Serve a cached page, or a 304 if the browser's copy is still current."""
+    response = get_conditional_response(request, etag=page['etag'], last_modified=page['last_modified'])
+    if response is None:
+        response = HttpResponse(page['content'])
+    response['ETag'] = page['etag']
+    response['Last-Modified'] = http_date(page['last_modified'])
+    # Browsers may keep the page but must revalidate it before reuse
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 @login_required
-def recipes_list(request):
-    form = RecipeSearchForm(request.GET or None)
+async def recipes_detail(request, pk):
+    # The rendered page is cached until the recipe, or one it lists as similar,
+    # is saved or deleted (see signals)
+    cache = get_page_cache()
+    version = await adetail_page_version(pk)
+    page = await cache.aget(detail_cache_key(pk), version=version)
+    if page is None:
+        try:
+            recipe = await Recipe.objects.aget(pk=pk)
+        except Recipe.DoesNotExist:
+            raise Http404('No recipe found')
+        similar = [row.similar async for row in similar_recipes(pk)]
+        response = render(request, 'recipes/recipes_detail.html', {
+            'recipe': recipe, 'object': recipe, 'similar_recipes': similar,
+        })
+        # Validators from the rendered page rather than the recipe row, so they
+        # also change with the similar recipes and the thumbnails shown
+        etag = '"%s"' % hashlib.sha1(response.content).hexdigest()
+        page = cached_page(response, etag, int(time.time()))
+        await cache.aset(detail_cache_key(pk), page, version=version)
+    return page_response(request, page)
+
+def similar_recipes(pk):
+    # The precomputed list (see recipes.similarity), one lookup on the recipe's rows
+    return (RecipeSimilarity.objects.filter(recipe_id=pk)
+            .select_related('similar')
+            .only('similar__name', 'similar__cooking_time', 'similar__difficulty', 'similar__pic')
+            .order_by('-score', 'similar_id')[:settings.RECIPES_SIMILAR_COUNT])
+
+def filter_recipes(form):
+    """Return the recipes matching a search form and the cleaned filters used."""
     recipes = Recipe.objects.all()
+    filters = {}
     
     # Apply search filters
     if form.is_valid():
+        filters = form.cleaned_data
         recipe_name = form.cleaned_data.get('recipe_name')
         ingredients = form.cleaned_data.get('ingredients')
+        ingredient_match = form.cleaned_data.get('ingredient_match')
         cooking_time_min = form.cleaned_data.get('cooking_time_min')
         cooking_time_max = form.cleaned_data.get('cooking_time_max')
         difficulty = form.cleaned_data.get('difficulty')
         
         if recipe_name:
-            recipes = recipes.filter(name__icontains=recipe_name)
+            recipes = search_recipes(recipes, recipe_name)
         
-        if ingredients:
-            # Split ingredients by comma and search for each
-            ingredient_terms = [term.strip() for term in ingredients.split(',')]
-            ingredient_query = Q()
-            for term in ingredient_terms:
-                ingredient_query |= Q(ingredients__icontains=term)
-            recipes = recipes.filter(ingredient_query)
+        ingredient_terms = split_ingredients(ingredients)
+        if ingredient_terms:
+            # Match whole ingredient names through the indexed join table
+            matches = RecipeIngredient.objects.filter(ingredient__name__in=ingredient_terms)
+            if ingredient_match == 'all':
+                matches = (matches.values('recipe')
+                           .annotate(matched=Count('ingredient'))
+                           .filter(matched=len(ingredient_terms)))
+            recipes = recipes.filter(id__in=matches.values('recipe'))
         
         if cooking_time_min is not None:
             recipes = recipes.filter(cooking_time__gte=cooking_time_min)
@@ -56,130 +106,365 @@ def recipes_list(request):
         if difficulty:
             recipes = recipes.filter(difficulty=difficulty)
     
-    # Generate charts if there are results
+    return recipes, filters
+
+def chart_urls(request, form):
+    # Charts are fetched by the browser from the chart endpoint with the same filters
+    query = urlencode([(name, request.GET[name]) for name in form.fields if request.GET.get(name)])
+    urls = {}
+    for kind in chart_pool.CHART_KINDS:
+        url = reverse('recipes:recipes_chart', args=[kind, chart_pool.chart_format()])
+        urls[f'{kind}_chart'] = f'{url}?{query}' if query else url
+    return urls
+
+def parse_cursor(cursor):
+    # Cursors look like "<cooking_time>_<id>" of the last recipe on the previous page
+    try:
+        cooking_time, pk = cursor.split('_')
+        return int(cooking_time), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+def after_cursor(recipes, cursor, page_size):
+    # The recipes after the cursor, plus one extra row to know whether there is a next page
+    position = parse_cursor(cursor)
+    if position is not None:
+        cooking_time, pk = position
+        recipes = recipes.filter(
+            Q(cooking_time__gt=cooking_time) | Q(cooking_time=cooking_time, id__gt=pk)
+        )
+    return recipes[:page_size + 1]
+
+def keyset_page(recipes, cursor, page_size):
+    """Return one page after the cursor and the cursor for the next page."""
+    return split_page(list(after_cursor(recipes, cursor, page_size)), page_size)
+
+async def akeyset_page(recipes, cursor, page_size):
+    return split_page([row async for row in after_cursor(recipes, cursor, page_size)], page_size)
+
+def split_page(page, page_size):
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        last = page[-1]
+        if isinstance(last, dict):
+            next_cursor = f"{last['cooking_time']}_{last['id']}"
+        else:
+            next_cursor = f'{last.cooking_time}_{last.id}'
+    
+    return page, next_cursor
+
+async def paginate_recipes(request, recipes, total, filters):
+    # Ordered by (cooking_time, id) so both pagination styles use the same index
+    recipes = recipes.order_by('cooking_time', 'id')
+    page_size = settings.RECIPES_PAGE_SIZE
+    
+    if 'cursor' in request.GET or settings.RECIPES_PAGINATION == 'keyset':
+        page, next_cursor = await akeyset_page(recipes, request.GET.get('cursor'), page_size)
+        return {
+            'recipes': page,
+            'page_obj': None,
+            'next_cursor': next_cursor,
+            'total_results': total,
+        }
+    
+    # Name searches list the best matches first
+    if filters.get('recipe_name'):
+        recipes = rank_recipes(recipes, filters['recipe_name'])
+    
+    paginator = Paginator(recipes, page_size)
+    # The total is already known, so skip the paginator's COUNT query
+    paginator.count = total
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = [recipe async for recipe in page_obj.object_list]
+    return {
+        'recipes': page_obj.object_list,
+        'page_obj': page_obj,
+        'next_cursor': None,
+        'total_results': paginator.count,
+    }
+
+@login_required
+async def recipes_list(request):
+    # Without search filters the page is the same for everyone until a
+    # recipe changes, so it is cached under the data version
+    cacheable = set(request.GET) <= {'page', 'cursor'}
+    if cacheable:
+        version = await aget_data_version()
+        key = list_cache_key(request.GET.urlencode())
+        page = await get_page_cache().aget(key, version=version)
+        if page is not None:
+            return page_response(request, page)
+    
+    form = RecipeSearchForm(request.GET or None)
+    recipes, filters = filter_recipes(form)
+    
+    # One aggregate query gives the result count without a separate COUNT,
+    # and is cached for the chart requests that follow
+    stats = await astats_for(recipes, filters)
+    
+    # Link the charts if there are results
     charts = {}
-    if recipes.exists():
-        charts = generate_charts(recipes)
+    if stats['total']:
+        charts = chart_urls(request, form)
+    
+    # Keep the search parameters in the pagination links
+    query = request.GET.copy()
+    query.pop('page', None)
+    query.pop('cursor', None)
     
     context = {
-        'recipes': recipes,
         'form': form,
         'charts': charts,
-        'total_results': recipes.count()
+        'pagination_query': query.urlencode(),
+        'cooking_time': stats.get('cooking_time'),
+        'cards_generation': await aget_pages_generation(),
+        **await paginate_recipes(request, recipes, stats['total'], filters),
     }
     
-    return render(request, 'recipes/recipes_list.html', context)
+    response = render(request, 'recipes/recipes_list.html', context)
+    if cacheable:
+        etag = '"%s"' % hashlib.sha1(f'{key}:{version}'.encode()).hexdigest()
+        page = cached_page(response, etag, int(time.time()))
+        await get_page_cache().aset(key, page, version=version)
+        return page_response(request, page)
+    return response
 
-def generate_charts(recipes_queryset):
-    # Convert QuerySet to DataFrame
-    recipes_data = list(recipes_queryset.values(
-        'name', 'cooking_time', 'difficulty', 'id'
-    ))
+@login_required
+async def recipes_chart(request, kind, fmt):
+    if kind not in chart_pool.CHART_KINDS or fmt not in CHART_CONTENT_TYPES:
+        raise Http404('Unknown chart')
     
-    if not recipes_data:
-        return {}
+    form = RecipeSearchForm(request.GET or None)
+    recipes, filters = filter_recipes(form)
+    
+    # Browsers revalidate with the ETag, which changes whenever the recipe data does
+    etag = chart_etag(filters, kind, fmt, await aget_data_version())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        chart = await aget_or_render_chart(filters, kind, fmt, lambda: render_chart(recipes, filters, kind, fmt))
+        if chart is None:
+            # Render pool busy or timed out; show a placeholder the browser won't keep
+            response = HttpResponse(CHART_UNAVAILABLE, content_type='image/svg+xml', status=503)
+            response['Retry-After'] = '5'
+            patch_cache_control(response, no_store=True)
+            return response
+        response = HttpResponse(chart, content_type=CHART_CONTENT_TYPES[fmt])
+        response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=settings.RECIPES_CHART_MAX_AGE)
+    return response
+
+# Pie chart categories as (upper bound in minutes, label)
+TIME_CATEGORIES = [
+    (15, 'Quick (≤15 min)'),
+    (30, 'Medium (16-30 min)'),
+    (60, 'Long (31-60 min)'),
+    (None, 'Very Long (>60 min)'),
+]
+
+# Fields the JSON API can return, and the ones it returns without fields=
+API_FIELDS = ('id', 'name', 'ingredients', 'cooking_time', 'difficulty', 'pic')
+API_DEFAULT_FIELDS = ('id', 'name', 'cooking_time', 'difficulty')
+API_MAX_LIMIT = 100
+
+@login_required
+async def recipes_api(request):
+    form = RecipeSearchForm(request.GET or None)
+    if form.is_bound and not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
     
-    df = pd.DataFrame(recipes_data)
+    fields = [field.strip() for field in request.GET.get('fields', '').split(',') if field.strip()]
+    fields = fields or list(API_DEFAULT_FIELDS)
+    unknown = [field for field in fields if field not in API_FIELDS]
+    if unknown:
+        return JsonResponse({'errors': {'fields': [f'Unknown field: {field}' for field in unknown]}}, status=400)
+    
+    try:
+        limit = min(max(int(request.GET.get('limit', settings.RECIPES_PAGE_SIZE)), 1), API_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'errors': {'limit': ['Enter a whole number.']}}, status=400)
+    
+    # The response only depends on the query string and the recipe data, so
+    # polling clients can revalidate without any recipe queries
+    query = sorted(request.GET.lists())
+    etag = '"%s"' % hashlib.sha1(f'{query}:{await aget_data_version()}'.encode()).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    
+    if response is None:
+        recipes, filters = filter_recipes(form)
+        stats = await astats_for(recipes, filters)
+        
+        # Only load the requested columns, plus the ones the cursor is built from
+        columns = list(dict.fromkeys([*fields, 'cooking_time', 'id']))
+        rows, next_cursor = await akeyset_page(
+            recipes.order_by('cooking_time', 'id').values(*columns), request.GET.get('cursor'), limit
+        )
+        
+        pic_storage = Recipe._meta.get_field('pic').storage
+        results = []
+        for row in rows:
+            if 'pic' in row:
+                row['pic'] = pic_storage.url(row['pic']) if row['pic'] else None
+            results.append({field: row[field] for field in fields})
+        
+        response = JsonResponse({
+            'total_results': stats['total'],
+            'next_cursor': next_cursor,
+            'results': results,
+        })
+        response['ETag'] = etag
+    
+    # Clients may keep the response but must revalidate it before reuse
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+@login_required
+async def recipes_autocomplete(request):
+    """Suggest recipe names, or ingredients, starting with ?q= for the search form."""
+    field = request.GET.get('field', 'name')
+    if field not in autocomplete.FIELDS:
+        return JsonResponse({'errors': {'field': [f'Unknown field: {field}']}}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT)), 1), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'errors': {'limit': ['Enter a whole number.']}}, status=400)
+    
+    query = request.GET.get('q', '')
+    # An ingredient list is completed one ingredient at a time
+    prefix = query.rpartition(',')[2] if field == 'ingredients' else query
+    version = await aget_data_version()
+    etag = '"%s"' % hashlib.sha1(f'{field}:{autocomplete.normalize(prefix)}:{limit}:{version}'.encode()).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    
+    if response is None:
+        indexes = autocomplete.current_indexes(version)
+        if indexes is None:
+            indexes = await sync_to_async(autocomplete.get_indexes)(version)
+        response = JsonResponse({'field': field, 'query': query, 'results': indexes[field].complete(prefix, limit)})
+        response['ETag'] = etag
+    
+    # Every prefix typed is its own URL, so the browser answers repeats itself
+    patch_cache_control(response, private=True, max_age=settings.RECIPES_AUTOCOMPLETE_MAX_AGE)
+    return response
+
+def stats_rows(recipes_queryset):
+    # Recipe counts grouped by difficulty, time category and 10 minute range
+    time_category = Case(
+        *[When(cooking_time__lte=limit, then=Value(label)) for limit, label in TIME_CATEGORIES[:-1]],
+        default=Value(TIME_CATEGORIES[-1][1]),
+    )
+    # Negative times are left out of the ranges like they were never charted
+    time_range = Case(
+        When(cooking_time__gte=0, then=F('cooking_time') / 10),
+        default=None,
+        output_field=IntegerField(),
+    )
+    return (recipes_queryset.order_by()
+            .annotate(time_category=time_category, time_range=time_range)
+            .values('difficulty', 'time_category', 'time_range')
+            .annotate(count=Count('id'), time_sum=Sum('cooking_time'),
+                      time_min=Min('cooking_time'), time_max=Max('cooking_time')))
+
+def recipe_stats(recipes_queryset):
+    """Count the recipes by difficulty, time category and 10 minute range in one query,
+    with their shortest, longest and mean cooking time."""
+    return fold_stats(stats_rows(recipes_queryset))
+
+async def arecipe_stats(recipes_queryset):
+    return fold_stats([row async for row in stats_rows(recipes_queryset)])
+
+def time_category(cooking_time):
+    return next(label for limit, label in TIME_CATEGORIES if limit is None or cooking_time <= limit)
+
+def bucket_stats(rows):
+    # Per-time RecipeStats rows bucketed like stats_rows() does in SQL
+    for row in rows:
+        cooking_time = row['cooking_time']
+        yield {
+            'difficulty': row['difficulty'],
+            'time_category': time_category(cooking_time),
+            'time_range': cooking_time // 10 if cooking_time >= 0 else None,
+            'count': row['count'],
+            # A row per cooking time, so its extremes are exact and removing
+            # the last recipe at the shortest time just drops its row
+            'time_sum': cooking_time * row['count'],
+            'time_min': cooking_time,
+            'time_max': cooking_time,
+        }
+
+async def asummary_stats():
+    """recipe_stats() of every recipe, from the maintained RecipeStats counts."""
+    return fold_stats(bucket_stats([row async for row in stored_stats_rows()]))
+
+async def astats_for(recipes_queryset, filters):
+    # Only the ingredient match mode left means no filtering at all, which
+    # the maintained counts answer without scanning the recipes
+    if not normalize_filters(filters).keys() - {'ingredient_match'}:
+        return await aget_or_compute_stats(filters, asummary_stats)
+    return await aget_or_compute_stats(filters, lambda: arecipe_stats(recipes_queryset))
+
+def fold_stats(rows):
+    stats = {'total': 0, 'difficulty': {}, 'time_category': {}, 'time_range': {}}
+    time_sum, times = 0, []
+    for row in rows:
+        count = row['count']
+        stats['total'] += count
+        time_sum += row['time_sum']
+        times += [row['time_min'], row['time_max']]
+        stats['difficulty'][row['difficulty']] = stats['difficulty'].get(row['difficulty'], 0) + count
+        stats['time_category'][row['time_category']] = stats['time_category'].get(row['time_category'], 0) + count
+        if row['time_range'] is not None:
+            stats['time_range'][row['time_range']] = stats['time_range'].get(row['time_range'], 0) + count
+    
+    stats['cooking_time'] = {
+        'min': min(times, default=None),
+        'max': max(times, default=None),
+        'mean': time_sum / stats['total'] if stats['total'] else None,
+    }
+    return stats
+
+def generate_charts(recipes_queryset, fmt=None, stats=None):
+    fmt = fmt or chart_pool.chart_format()
+    if stats is None:
+        stats = recipe_stats(recipes_queryset)
+    
+    if not stats['total']:
+        return {}
     
     charts = {}
     
     # 1. Pie Chart - Cooking Time Distribution
-    charts['pie_chart'] = create_cooking_time_pie_chart(df)
+    charts['pie_chart'] = chart_pool.render_chart('pie', stats, fmt)
     
     # 2. Bar Chart - Difficulty Distribution
-    charts['bar_chart'] = create_difficulty_bar_chart(df)
+    charts['bar_chart'] = chart_pool.render_chart('bar', stats, fmt)
     
     # 3. Line Chart - Recipe Count by Cooking Time Range
-    charts['line_chart'] = create_cooking_time_line_chart(df)
+    charts['line_chart'] = chart_pool.render_chart('line', stats, fmt)
     
     return charts
 
-def create_cooking_time_pie_chart(df):
-    # Categorize cooking times
-    def categorize_time(time):
-        if time <= 15:
-            return 'Quick (≤15 min)'
-        elif time <= 30:
-            return 'Medium (16-30 min)'
-        elif time <= 60:
-            return 'Long (31-60 min)'
-        else:
-            return 'Very Long (>60 min)'
-    
-    df['time_category'] = df['cooking_time'].apply(categorize_time)
-    time_counts = df['time_category'].value_counts()
-    
-    plt.figure(figsize=(10, 8))
-    colors = ['#ff6b35', '#e85a14', '#ff9f80', '#cc4400']
-    
-    plt.pie(time_counts.values, labels=time_counts.index, autopct='%1.1f%%',
-            startangle=90, colors=colors)
-    plt.title('Recipe Distribution by Cooking Time', fontsize=16, fontweight='bold')
-    
-    # Convert to base64 string
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight', dpi=150)
-    buffer.seek(0)
-    chart_data = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-    
-    return chart_data
-
-def create_difficulty_bar_chart(df):
-    difficulty_counts = df['difficulty'].value_counts()
-    
-    plt.figure(figsize=(10, 6))
-    bars = plt.bar(difficulty_counts.index, difficulty_counts.values, 
-                   color=['#90EE90', '#FFD700', '#FF6347'])
-    
-    plt.title('Recipe Distribution by Difficulty Level', fontsize=16, fontweight='bold')
-    plt.xlabel('Difficulty Level', fontsize=12)
-    plt.ylabel('Number of Recipes', fontsize=12)
-    
-    # Add value labels on bars
-    for bar in bars:
-        height = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width()/2., height,
-                f'{int(height)}', ha='center', va='bottom')
-    
-    plt.grid(axis='y', alpha=0.3)
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight', dpi=150)
-    buffer.seek(0)
-    chart_data = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-    
-    return chart_data
-
-def create_cooking_time_line_chart(df):
-    # Create cooking time ranges
-    time_ranges = range(0, int(df['cooking_time'].max()) + 10, 10)
-    range_counts = []
-    range_labels = []
-    
-    for i in range(len(time_ranges) - 1):
-        start = time_ranges[i]
-        end = time_ranges[i + 1]
-        count = len(df[(df['cooking_time'] >= start) & (df['cooking_time'] < end)])
-        range_counts.append(count)
-        range_labels.append(f'{start}-{end-1}')
-    
-    plt.figure(figsize=(12, 6))
-    plt.plot(range_labels, range_counts, marker='o', linewidth=2, 
-             markersize=8, color='#ff6b35')
-    plt.fill_between(range_labels, range_counts, alpha=0.3, color='#ff6b35')
-    
-    plt.title('Recipe Count by Cooking Time Range', fontsize=16, fontweight='bold')
-    plt.xlabel('Cooking Time Range (minutes)', fontsize=12)
-    plt.ylabel('Number of Recipes', fontsize=12)
-    plt.xticks(rotation=45)
-    plt.grid(True, alpha=0.3)
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight', dpi=150)
-    buffer.seek(0)
-    chart_data = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-    
-    return chart_data
+async def render_chart(recipes_queryset, filters, kind, fmt='png'):
+    # Render a single chart, or None if the render pool could not produce it in time
+    stats = await astats_for(recipes_queryset, filters)
+    
+    if not stats['total']:
+        raise Http404('No recipes to chart')
+    
+    # Matplotlib is CPU bound, so wait on the worker pool instead of the event
+    # loop; the SVG backend renders in place
+    return await chart_pool.arender_chart(kind, stats, fmt)
+
+CHART_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+CHART_UNAVAILABLE = (
+    b'<svg xmlns="http://www.w3.org/2000/svg" width="400" height="60">'
+    b'<text x="200" y="35" text-anchor="middle" font-family="Arial, sans-serif" '
+    b'font-size="18" fill="#666">Chart unavailable</text></svg>'
+)